@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from synthetic import make_graph, package_name, timed, report  # noqa: E402
+
+SIZES = [100, 1000, 10000]
+
+
+def run(size):
+    results = {}
+    graph = make_graph(size)
+    with timed(results, 'resolve_dependencies'):
+        graph.resolve_dependencies()
+    with timed(results, f'find x{size}'):
+        for index in range(size):
+            graph.find(package_name(index))
+    deps = [dep for pkg in graph for dep in pkg.deps]
+    with timed(results, f'match x{len(deps)}'):
+        for dep in deps:
+            graph.match(dep)
+    return results
+
+
+if __name__ == '__main__':
+    for size in SIZES:
+        report(f'{size} packages', run(size))
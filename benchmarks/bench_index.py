@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from grip.index import Index  # noqa: E402
+from grip.model import Dependency  # noqa: E402
+from synthetic import make_candidates, timed, report  # noqa: E402
+
+SIZES = [100, 1000, 5000]
+LOOKUPS = 20
+
+
+def legacy_best_candidate_of(index, dep, candidates):
+    # the string round-tripping implementation, for comparison
+    compatible_versions = set(dep.req.specifier.filter([str(c.version) for c in candidates], prereleases=False))
+    if len(compatible_versions) == 0:
+        compatible_versions = set(dep.req.specifier.filter([str(c.version) for c in candidates], prereleases=True))
+    applicable_candidates = [c for c in candidates if str(c.version) in compatible_versions]
+    if len(applicable_candidates):
+        return max(applicable_candidates, key=index.finder._candidate_sort_key)
+
+
+def run(size):
+    results = {}
+    index = Index('')
+    candidates = make_candidates('botocore', size)
+    minors = [size // 10 * x // LOOKUPS for x in range(LOOKUPS)]
+    deps = [
+        Dependency(f'botocore>=1.{minor}' if x % 2 else f'botocore>=1.{minor // 2},<1.{minor + 1}')
+        for x, minor in enumerate(minors)
+    ]
+
+    with timed(results, f'legacy x{LOOKUPS}'):
+        for dep in deps:
+            legacy_best_candidate_of(index, dep, candidates)
+    with timed(results, 'first sort'):
+        index.sorted_candidates(candidates)
+    with timed(results, f'best_candidate_of x{LOOKUPS}'):
+        for dep in deps:
+            index.best_candidate_of(dep, candidates)
+    with timed(results, f'best_candidates_of x{LOOKUPS}'):
+        index.best_candidates_of(deps, candidates)
+    return results
+
+
+if __name__ == '__main__':
+    for size in SIZES:
+        report(f'{size} releases', run(size))
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from synthetic import make_graph  # noqa: E402
+
+SIZES = [1000, 10000]
+
+
+def run(size):
+    tracemalloc.start()
+    graph = make_graph(size)
+    graph.resolve_dependencies()
+    deps = 0
+    for pkg in graph:
+        for dep in pkg.deps:
+            dep.req
+            deps += 1
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak, deps
+
+
+if __name__ == '__main__':
+    for size in SIZES:
+        current, peak, deps = run(size)
+        print(f'{size} packages, {deps} dependencies')
+        print(f'  {"retained":<30} {current / 1024 / 1024:10.2f} MB')
+        print(f'  {"peak":<30} {peak / 1024 / 1024:10.2f} MB')
+        print(f'  {"per package":<30} {current / size:10.0f} B')
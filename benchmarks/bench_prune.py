@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from grip.model import PackageGraph, Package, Dependency  # noqa: E402
+from grip.planner import Planner  # noqa: E402
+from synthetic import package_name, timed, report  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+LEGACY_MAX_SIZE = 10000
+
+
+def make_chain(size):
+    # pkg0 -> pkg1 -> ... -> pkgN, nothing requires pkg0 so the whole chain is orphaned
+    pkgs = [Package(package_name(x), '1.0') for x in range(size)]
+    for pkg, target in zip(pkgs, pkgs[1:]):
+        pkg.deps = [Dependency(target.name, parent=pkg)]
+    graph = PackageGraph(sorted(pkgs), requirements=[])
+    graph.resolve_dependencies()
+    return graph
+
+
+def make_fan_in(size):
+    # every package requires the last one, which is where the legacy list lookups add up
+    pkgs = [Package(package_name(x), '1.0') for x in range(size)]
+    for pkg in pkgs[:-1]:
+        pkg.deps = [Dependency(pkgs[-1].name, parent=pkg)]
+    graph = PackageGraph(sorted(pkgs), requirements=[])
+    graph.resolve_dependencies()
+    return graph
+
+
+def legacy_prune(graph):
+    # the single pass over a list, for comparison
+    for_removal = []
+    for pkg in graph:
+        if pkg.name in PackageGraph.SYSTEM_PKGS:
+            continue
+        if all(x in for_removal for x in (pkg.incoming + pkg.incoming_mismatched)):
+            for_removal.append(pkg)
+    return for_removal
+
+
+def run(shape, size):
+    results = {}
+    graph = shape(size)
+    if size <= LEGACY_MAX_SIZE:
+        with timed(results, 'legacy'):
+            removed = legacy_prune(graph)
+        print(f'{size} packages: legacy prune removes {len(removed)}')
+    with timed(results, 'prune'):
+        removed = list(Planner(graph, quiet=True).prune())
+    print(f'{size} packages: prune removes {len(removed)}')
+    return results
+
+
+if __name__ == '__main__':
+    for size in SIZES:
+        report(f'{size} package chain', run(make_chain, size))
+        report(f'{size} package fan-in', run(make_fan_in, size))
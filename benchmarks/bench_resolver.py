@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from grip.model import PackageGraph  # noqa: E402
+from grip.planner import Planner, InstallAction, FailAction  # noqa: E402
+from synthetic import SyntheticIndex, timed, report  # noqa: E402
+
+SIZES = [10, 50, 100]
+
+
+def run(size):
+    results = {}
+    index = SyntheticIndex(size)
+    planner = Planner(PackageGraph(), index, quiet=True, metadata=index)
+    with timed(results, 'resolve'):
+        plan = list(planner.resolve(index.roots))
+    print(
+        f'{size} packages:',
+        'failed' if FailAction() in plan else f'{len([x for x in plan if isinstance(x, InstallAction)])} installs',
+        f'after {planner.rounds} rounds',
+    )
+    return results
+
+
+if __name__ == '__main__':
+    for size in SIZES:
+        report(f'{size} packages', run(size))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from grip.model import Dependency, Package  # noqa: E402
+from grip.model.specifier import CompiledSpecifier  # noqa: E402
+from synthetic import timed, report  # noqa: E402
+
+SIZES = [1000, 10000]
+SPECS = ['>=1.5', '>=1.2,<1.8', '~=1.4.2', '==1.3.*', '!=1.5.0,<2', '==1.7.3']
+
+
+def run(size):
+    results = {}
+    versions = sorted(Package.parse_version(f'1.{x // 10}.{x % 10}') for x in range(size))
+    deps = [Dependency(f'botocore{x}') for x in SPECS]
+    [dep.req for dep in deps]
+
+    with timed(results, f'legacy filter x{len(SPECS)}'):
+        legacy = [[len(list(dep.specifier.filter([str(v)]))) > 0 for v in versions] for dep in deps]
+    with timed(results, f'SpecifierSet.contains x{len(SPECS)}'):
+        [[dep.specifier.contains(v, prereleases=True) for v in versions] for dep in deps]
+    with timed(results, f'compiled contains (cold) x{len(SPECS)}'):
+        [[dep.matches_version(v) for v in versions] for dep in deps]
+    with timed(results, f'compiled contains (warm) x{len(SPECS)}'):
+        [[dep.matches_version(v) for v in versions] for dep in deps]
+    with timed(results, f'mask x{len(SPECS)}'):
+        masks = [CompiledSpecifier(dep.specifier).mask(versions) for dep in deps]
+    assert masks == legacy
+    return results
+
+
+if __name__ == '__main__':
+    for size in SIZES:
+        report(f'{size} versions', run(size))
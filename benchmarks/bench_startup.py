@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from synthetic import timed, report  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RUNS = 10
+
+
+def environment(virtualenv):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    env['VIRTUAL_ENV'] = virtualenv
+    return env
+
+
+def import_time(env):
+    # cumulative microseconds reported by -X importtime for grip.main
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import grip.main'],
+        env=env, stderr=subprocess.PIPE, check=True,
+    ).stderr.decode()
+    for line in output.splitlines():
+        if line.split('|')[-1].strip() == 'grip.main':
+            return int(line.split('|')[1]) / 1000000
+
+
+def run():
+    results = {}
+    with tempfile.TemporaryDirectory() as virtualenv:
+        os.mkdir(os.path.join(virtualenv, 'bin'))
+        os.symlink('/bin/true', os.path.join(virtualenv, 'bin', 'true'))
+        env = environment(virtualenv)
+
+        results['import grip.main'] = min(import_time(env) for _ in range(RUNS))
+        with timed(results, f'python -c pass x{RUNS}'):
+            for _ in range(RUNS):
+                subprocess.run([sys.executable, '-c', 'pass'], env=env, check=True)
+        with timed(results, f'grip run true x{RUNS}'):
+            for _ in range(RUNS):
+                subprocess.run(
+                    [sys.executable, '-c', 'from grip.main import cli; cli()', 'run', 'true'],
+                    env=env, cwd=virtualenv, check=True,
+                )
+    return results
+
+
+if __name__ == '__main__':
+    report('startup', run())
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from grip.model import PackageGraph, Package, Dependency  # noqa: E402
+from synthetic import package_name, timed, report  # noqa: E402
+
+SIZES = [1000, 10000]
+FANOUT = 3
+LIMIT = 100
+
+
+def make_layers(size):
+    # every package requires a few from the next layer and the last one closes a cycle back to the first
+    pkgs = [Package(package_name(x), '1.0') for x in range(size)]
+    for i, pkg in enumerate(pkgs):
+        pkg.deps = [Dependency(pkgs[(i * FANOUT + j + 1) % size].name, parent=pkg) for j in range(FANOUT)]
+    graph = PackageGraph(sorted(pkgs), requirements=[Dependency(pkgs[0].name)])
+    graph.resolve_dependencies()
+    return graph, pkgs[-1]
+
+
+def run(size):
+    results = {}
+    graph, target = make_layers(size)
+    with timed(results, 'root depths'):
+        graph.root_depths()
+    with timed(results, f'first {LIMIT} chains'):
+        paths = list(itertools.islice(graph.why(target), LIMIT))
+    print(f'{size} packages: {len(paths)} chains, shortest has {len(paths[0])} packages')
+    return results
+
+
+if __name__ == '__main__':
+    for size in SIZES:
+        report(f'{size} packages', run(size))
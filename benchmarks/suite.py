@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+'''
+Times graph loading, resolution, planning and candidate selection on
+synthetic site-packages trees and indexes, and stores the results as JSON:
+
+    benchmarks/suite.py --sizes 100,1000 --output before.json
+    benchmarks/suite.py --sizes 100,1000 --output after.json --compare before.json
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from grip.model import PackageGraph, Dependency  # noqa: E402
+from grip.model.cache import MetadataCache  # noqa: E402
+from grip.planner import Planner  # noqa: E402
+from synthetic import make_site_packages, make_index, package_name  # noqa: E402
+
+LOOKUPS = 20
+
+
+def best_of(repeat, fx, setup=None):
+    best = None
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        fx(state)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def run(size, repeat, fanout, releases):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        site_packages = os.path.join(tmp, 'site-packages')
+        make_site_packages(site_packages, size, fanout=fanout)
+        index = make_index(size, releases=releases)
+        names = [package_name(x * size // LOOKUPS) for x in range(min(LOOKUPS, size))]
+
+        def drop_cache():
+            path = os.path.join(site_packages, MetadataCache.FILENAME)
+            if os.path.exists(path):
+                os.unlink(path)
+
+        def load(resolve=True):
+            graph = PackageGraph.from_directory(site_packages)
+            if resolve:
+                graph.resolve_dependencies()
+            return graph
+
+        results['from_directory (cold)'] = best_of(
+            repeat, lambda _: PackageGraph.from_directory(site_packages), setup=drop_cache,
+        )
+        load()
+        results['from_directory (warm)'] = best_of(repeat, lambda _: PackageGraph.from_directory(site_packages))
+        results['resolve_dependencies'] = best_of(
+            repeat, lambda graph: graph.resolve_dependencies(), setup=lambda: load(resolve=False),
+        )
+        results[f'Planner.resolve x{len(names)}'] = best_of(
+            repeat,
+            lambda planner: list(planner.resolve([Dependency(f'{x}>=1.5') for x in names], upgrade=True)),
+            setup=lambda: Planner(load(), index, quiet=True, metadata=index),
+        )
+        results['Planner.prune'] = best_of(
+            repeat, lambda planner: list(planner.prune()), setup=lambda: Planner(load(), quiet=True),
+        )
+        results[f'Planner.remove x{len(names)}'] = best_of(
+            repeat, lambda planner: list(planner.remove(names)), setup=lambda: Planner(load(), quiet=True),
+        )
+
+        deps = [Dependency(f'{x}>=1.{i % 10},<{2 + i % 2}') for i, x in enumerate(names)]
+        all_candidates = [index.candidates_for(x) for x in deps]
+        results[f'Index.best_candidate_of x{len(deps)}'] = best_of(
+            repeat,
+            lambda index: [index.best_candidate_of(dep, c) for dep, c in zip(deps, all_candidates)],
+            setup=lambda: make_index(0),
+        )
+    return results
+
+
+def commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='grip benchmark suite')
+    parser.add_argument('--sizes', default='100,1000', help='comma separated package counts')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, the best one is kept')
+    parser.add_argument('--fanout', type=int, default=3, help='dependencies per package')
+    parser.add_argument('--releases', type=int, default=30, help='releases per project in the index')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    data = {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'parameters': {'repeat': args.repeat, 'fanout': args.fanout, 'releases': args.releases},
+        'results': {},
+    }
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    for size in [int(x) for x in args.sizes.split(',')]:
+        results = run(size, args.repeat, args.fanout, args.releases)
+        data['results'][str(size)] = results
+        print(f'{size} packages')
+        for name, value in results.items():
+            line = f'  {name:<36} {value * 1000:10.2f} ms'
+            before = baseline.get(str(size), {}).get(name)
+            if before:
+                line += f'  {value / before:6.2f}x vs {before * 1000:.2f} ms'
+            print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from grip.model import PackageGraph, Package, Dependency, Version
+
+
+def package_name(index):
+    return f'pkg{index}'
+
+
+def make_graph(size, fanout=3, seed=0):
+    rnd = random.Random(seed)
+    pkgs = []
+    for index in range(size):
+        pkg = Package(package_name(index), f'{rnd.randint(1, 3)}.0')
+        targets = rnd.sample(range(size), min(fanout, size))
+        pkg.deps = [
+            Dependency(f'{package_name(target)}>={rnd.randint(1, 3)}.0', pkg)
+            for target in targets if target != index
+        ]
+        pkgs.append(pkg)
+    roots = [Dependency(f'{package_name(x)}>=1.0') for x in rnd.sample(range(size), min(10, size))]
+    return PackageGraph(sorted(pkgs), requirements=roots)
+
+
+class SyntheticIndex:
+    '''
+    A fake package index where every version of pkgN depends on a chain of
+    later packages with ranges that conflict with the roots, forcing the
+    resolver to backtrack
+    '''
+
+    def __init__(self, size, versions=5, fanout=2, seed=0):
+        rnd = random.Random(seed)
+        self.releases = {}
+        for index in range(size):
+            name = package_name(index)
+            self.releases[name] = {}
+            for version in range(1, versions + 1):
+                deps = []
+                if index + 1 < size:
+                    deps.append(f'{package_name(index + 1)}>={version}')
+                for target in rnd.sample(range(index + 1, size), min(fanout, size - index - 1)):
+                    deps.append(f'{package_name(target)}<={rnd.randint(1, versions)}')
+                self.releases[name][Version(str(version))] = deps
+        self.roots = [Dependency(package_name(0)), Dependency(f'{package_name(size - 1)}<=2')]
+
+    def candidates_for(self, dep, source=False):
+        return [Package(dep.name, version) for version in self.releases.get(dep.name, {})]
+
+    def sorted_candidates_of(self, deps, candidates):
+        return sorted(
+            (c for c in candidates if all(dep.matches_version(c.version) for dep in deps)),
+            key=lambda c: c.version,
+            reverse=True,
+        )
+
+    def requirements_for(self, dep):
+        return self.releases[dep.name][dep.potential_candidate.version]
+
+
+def make_candidates(name, count):
+    from pip.index import InstallationCandidate, Link
+
+    return [
+        InstallationCandidate(name, f'1.{x // 10}.{x % 10}', Link(f'https://example.com/{name}-1.{x // 10}.{x % 10}.tar.gz'))
+        for x in range(count)
+    ]
+
+
+def make_site_packages(path, size, fanout=3, files=5, seed=0):
+    '''
+    Writes a site-packages tree with a dist-info (METADATA and RECORD) and
+    a few module files for every package of a random dependency graph
+    '''
+    rnd = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    for index in range(size):
+        name = package_name(index)
+        version = f'{rnd.randint(1, 3)}.0'
+        dist_info = os.path.join(path, f'{name}-{version}.dist-info')
+        os.mkdir(dist_info)
+        os.mkdir(os.path.join(path, name))
+
+        record = []
+        for file in range(files):
+            record.append(f'{name}/module{file}.py')
+            with open(os.path.join(path, record[-1]), 'w') as f:
+                f.write('\n')
+        record += [f'{name}-{version}.dist-info/METADATA', f'{name}-{version}.dist-info/RECORD']
+
+        with open(os.path.join(dist_info, 'METADATA'), 'w') as f:
+            f.write(f'Metadata-Version: 2.0\nName: {name}\nVersion: {version}\n')
+            for target in rnd.sample(range(size), min(fanout, size)):
+                if target != index:
+                    f.write(f'Requires-Dist: {package_name(target)} (>={rnd.randint(1, 3)}.0)\n')
+        with open(os.path.join(dist_info, 'RECORD'), 'w') as f:
+            f.write(''.join(f'{x},,\n' for x in record))
+
+
+def make_index(size, releases=30, prereleases=0.1, wheels=0.5, seed=0):
+    '''
+    An Index that serves generated candidates for pkg0..pkgN instead of
+    talking to a server, with the given number and kind of releases, none of
+    which have dependencies
+    '''
+    from pip.index import InstallationCandidate, Link
+    from grip.index import Index
+
+    rnd = random.Random(seed)
+    projects = {}
+    for index in range(size):
+        name = package_name(index)
+        projects[name] = []
+        for release in range(releases):
+            version = f'{1 + release // 10}.{release % 10}'
+            if rnd.random() < prereleases:
+                version += 'b1'
+            extension = '-py3-none-any.whl' if rnd.random() < wheels else '.tar.gz'
+            projects[name].append(InstallationCandidate(
+                name, version, Link(f'https://example.com/{name}-{version}{extension}'),
+            ))
+
+    class SyntheticSimpleIndex(Index):
+        def candidates_for(self, dep, source=False):
+            candidates = projects.get(dep.name, [])
+            if source:
+                candidates = [x for x in candidates if not x.location.is_wheel]
+            return candidates
+
+        def requirements_for(self, dep):
+            return []
+
+    return SyntheticSimpleIndex('')
+
+
+@contextmanager
+def timed(results, name):
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
+
+
+def report(title, results):
+    print(title)
+    for name, value in results.items():
+        print(f'  {name:<30} {value * 1000:10.2f} ms')
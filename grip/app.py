@@ -1,49 +1,64 @@
-from contextlib import contextmanager
-import logging
-import multiprocessing.pool
 import os
 import sys
 import subprocess
-from urllib.parse import urlparse
-from urllib.request import urlretrieve
-
-import pip.utils.logging
-from pip.commands import InstallCommand
-from pip._vendor.packaging.requirements import Requirement
-from virtualenv import create_environment
 
 import grip.ui as ui
-import grip.templates as templates
+from .timings import Timings
 
-from .model import Dependency, PackageGraph
+# pip, pkg_resources and friends take a good part of a second to import, so
+# they are only imported by the commands that need them and `grip run` stays fast
 from .requirements import TxtRequirements, SetupPyRequirements
-from .planner import Planner, RemoveAction, InstallAction, FailAction, SaveAction
-from .index import Index
-
-
 
-@contextmanager
-def pip_progress():
-    with ui.log_line() as log:
-        def emit(self, record):
-            log(record.getMessage())
-
-        logging.StreamHandler.emit = emit
-        yield
 
 
 class App:
     def __init__(self):
         self.interactive = False
+        self.jobs = None
         self.virtualenv = None
         self.requirements = None
         self.cached_requirements = None
+        # the graph of the current command, kept up to date by run_actions
+        self.graph = None
         self.site_packages = sys.path[-1]
         if 'VIRTUAL_ENV' in os.environ:
             self.set_virtualenv(os.environ['VIRTUAL_ENV'])
 
+        self.offline = False
+        self.concurrency = None
+        self.timings = Timings()
+        self.show_timings = False
         self.index_url = 'https://pypi.org/simple/'
-        self.index = Index(self.index_url)
+        self._index = None
+        self._wheel_cache = None
+        self._artifact_cache = None
+
+    @property
+    def index(self):
+        if not self._index:
+            from .index import Index
+            self._index = Index(
+                self.index_url,
+                concurrency=self.concurrency or Index.DEFAULT_CONCURRENCY,
+                wheels=self.wheel_cache,
+                offline=self.offline,
+                timings=self.timings,
+            )
+        return self._index
+
+    @property
+    def wheel_cache(self):
+        if not self._wheel_cache:
+            from .downloads import WheelCache
+            self._wheel_cache = WheelCache()
+        return self._wheel_cache
+
+    @property
+    def artifact_cache(self):
+        if not self._artifact_cache:
+            from .downloads import ArtifactCache
+            self._artifact_cache = ArtifactCache()
+        return self._artifact_cache
 
     def ensure_virtualenv(self):
         virtualenv = self.locate_virtualenv()
@@ -74,6 +89,8 @@ class App:
         )
 
     def create_virtualenv(self, path, interpreter):
+        from virtualenv import create_environment
+
         ui.info('Setting up a virtualenv in', ui.bold(path))
         create_environment(
             path,
@@ -87,11 +104,45 @@ class App:
         if not path:
             path = os.getcwd()
 
-        for candidate in candidates + os.listdir(path):
+        for candidate in candidates:
             subpath = os.path.join(path, candidate)
             if os.path.exists(os.path.join(subpath, 'bin', 'activate')):
                 return subpath
 
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name not in candidates and entry.is_dir():
+                    if os.path.exists(os.path.join(entry.path, 'bin', 'activate')):
+                        return entry.path
+
+    def find_virtualenv(self, path=None):
+        '''
+        Looks for a virtualenv in the given directory and its parents, using
+        cached results for directories that haven't changed since
+        '''
+        from .venvcache import VirtualenvCache
+
+        cache = VirtualenvCache()
+        path = os.path.abspath(path or os.getcwd())
+        try:
+            while True:
+                mtime = os.stat(path).st_mtime_ns
+                entry = cache.get(path, mtime)
+                if entry:
+                    virtualenv = entry['virtualenv']
+                else:
+                    virtualenv = self.locate_virtualenv(path)
+                    cache.put(path, mtime, virtualenv)
+                if virtualenv:
+                    return virtualenv
+
+                parent = os.path.dirname(path)
+                if parent == path:
+                    return None
+                path = parent
+        finally:
+            cache.save()
+
     def locate_requirements(self, path=None):
         candidates = ['requirements.txt', 'REQUIREMENTS', 'requirements', 'requirements/default.txt']
         if not path:
@@ -102,54 +153,111 @@ class App:
             if os.path.isfile(subpath):
                 return TxtRequirements(subpath)
 
-        setuppy = os.path.join(path, 'setup.py')
-        if os.path.isfile(setuppy):
-            return SetupPyRequirements(setuppy)
+        for candidate in SetupPyRequirements.FILES:
+            subpath = os.path.join(path, candidate)
+            if os.path.isfile(subpath):
+                return SetupPyRequirements(subpath)
+
+    def locate_lockfile(self, path=None):
+        from .lockfile import Lockfile
+
+        return Lockfile(os.path.join(path or os.getcwd(), Lockfile.FILENAME))
+
+    def set_offline(self, offline):
+        self.offline = offline
+        if self._index:
+            self._index.offline = offline
 
     def set_requirements(self, requirements):
         self.requirements = requirements
 
-    def load_dependency_graph(self):
-        graph = PackageGraph.from_directory(self.site_packages)
+    def load_dependency_graph(self, resolve=True):
+        from .model import PackageGraph
+
+        with self.timings.span('load graph'):
+            graph = PackageGraph.from_directory(self.site_packages)
 
         if self.requirements:
             if not self.cached_requirements:
-                self.cached_requirements = self.requirements.read()
+                with self.timings.span('read requirements'):
+                    self.cached_requirements = list(self.requirements.read())
             graph.set_requirements(self.cached_requirements)
 
-        graph.resolve_dependencies()
+        if resolve:
+            with self.timings.span('resolve graph'):
+                graph.resolve_dependencies()
         return graph
 
-    def run_actions(self, actions):
-        for action in actions:
-            if isinstance(action, InstallAction):
-                ui.info('Installing', ui.dep(action.dependency))
-                command = InstallCommand()
-                with pip_progress():
-                    command.main([
-                        '--no-deps',
-                        '--index-url', self.index_url,
-                        '--prefix', self.virtualenv,
-                        '--ignore-installed',
-                        '--upgrade',
-                        str(action.dependency)
-                    ])
-            if isinstance(action, SaveAction):
-                self.requirements.add(action.spec)
-            if isinstance(action, FailAction):
-                sys.exit(1)
-            if isinstance(action, RemoveAction):
-                ui.info('Removing', ui.pkg(action.package))
-                entries = action.package.metadata.get_metadata('RECORD').splitlines()
-                for line in entries:
-                    path = line.split(',')[0]
-                    path = os.path.join(self.site_packages, path)
-                    if os.path.exists(path):
-                        os.unlink(path)
-                        if len(os.listdir(os.path.split(path)[0])) == 0:
-                            os.rmdir(os.path.split(path)[0])
+    def list_dist_infos(self):
+        return set(x for x in os.listdir(self.site_packages) if x.endswith('.dist-info'))
+
+    def make_installer(self):
+        from .installer import Installer
+
+        return Installer(
+            self.virtualenv,
+            index_url=self.index_url,
+            jobs=self.jobs,
+            cache=self.artifact_cache,
+            wheels=self.wheel_cache,
+            offline=self.offline,
+            timings=self.timings,
+        )
+
+    def run_actions(self, actions, graph, installer=None):
+        from .model import PackageGraph
+        from .planner import RemoveAction, InstallAction, FailAction, SaveAction
+        from .remover import Remover
+
+        actions = list(actions)
+        if any(isinstance(x, FailAction) for x in actions):
+            sys.exit(1)
+
+        added = []
+        removed = []
+        # removed files are only deleted for good once the installs went through
+        with Remover(self.site_packages) as remover:
+            for action in actions:
+                if isinstance(action, RemoveAction):
+                    ui.info('Removing', ui.pkg(action.package))
+                    with self.timings.span('remove'):
+                        remover.remove(action.package)
+                    removed.append(action.package)
+            with self.timings.span('remove'):
+                remover.prune()
+
+            installs = [x for x in actions if isinstance(x, InstallAction)]
+            if len(installs):
+                dist_infos = self.list_dist_infos()
+                # a failing level exits, and the rollback has to undo the levels before it, too
+                remover.track_installs(dist_infos)
+                if installer:
+                    installer.install(installs)
+                else:
+                    with self.make_installer() as installer:
+                        installer.install(installs)
+                for dir in self.list_dist_infos() - dist_infos:
+                    added += PackageGraph.load_packages(self.site_packages, dir)
+
+        saves = [x for x in actions if isinstance(x, SaveAction)]
+        if saves:
+            with self.timings.span('save'):
+                with self.requirements.batch():
+                    for action in saves:
+                        self.requirements.add(action.spec)
+            self.cached_requirements = list(self.requirements.read())
+
+        # the follow-up consistency check needs no full reload of site-packages
+        graph.patch(
+            added=added,
+            removed=removed,
+            requirements=self.cached_requirements if saves else None,
+        )
+        self.graph = graph
 
     def perform_init(self):
+        import grip.templates as templates
+
         default_url = 'http://example.com'
         try:
             default_url = subprocess.check_output(['git', 'config', 'remote.origin.url']).decode().strip()
@@ -199,6 +307,10 @@ class App:
                     f.write(template.format(**vars))
 
     def perform_run(self, binary, args):
+        if not self.virtualenv:
+            virtualenv = self.find_virtualenv()
+            if virtualenv:
+                self.set_virtualenv(virtualenv)
         if not self.virtualenv:
             ui.error('No virtualenv available')
             sys.exit(1)
@@ -208,8 +320,16 @@ class App:
             sys.exit(1)
         os.execvp(path, [binary] + list(args))
 
-    def perform_check(self, silent=False):
-        pkgs = self.load_dependency_graph()
+    def perform_check(self, silent=False, format='text'):
+        from .model import PackageGraph
+
+        pkgs = self.graph if self.graph is not None else self.load_dependency_graph()
+        if format != 'text':
+            with ui.RecordWriter(format) as writer:
+                for record in ui.problem_records(pkgs):
+                    writer.write(record)
+            return
+
         problem_counter = 0
         extraneous_counter = 0
 
@@ -245,55 +365,114 @@ class App:
         elif not silent and not extraneous_counter:
             ui.info('No problems found')
 
-    def perform_freeze(self):
-        pkgs = self.load_dependency_graph()
+    def perform_freeze(self, format='text'):
+        pkgs = self.load_dependency_graph(resolve=False)
+        if format != 'text':
+            with ui.RecordWriter(format) as writer:
+                for pkg in pkgs:
+                    writer.write(ui.package_record(pkg))
+            return
         for pkg in pkgs:
             print(ui.bold(pkg.name) + ui.cyan('==' + str(pkg.version)))
 
+    def perform_lock(self):
+        from .downloads import ArtifactCache, HashMismatch
+        from .model import Dependency, PackageGraph
+
+        graph = self.load_dependency_graph(resolve=False)
+        pkgs = [x for x in graph if x.name not in PackageGraph.SYSTEM_PKGS]
+        deps = [Dependency.exact(x) for x in pkgs]
+
+        urls = []
+        for dep, candidates in zip(deps, self.index.candidates_for_many(deps)):
+            best_candidate = self.index.best_candidate_of(dep, candidates)
+            if not best_candidate:
+                ui.warn('No artifact found for', ui.dep(dep))
+            urls.append(best_candidate.location.url if best_candidate else None)
+
+        # artifacts without a digest in the index link have to be hashed locally
+        try:
+            self.artifact_cache.fetch_many([
+                x for x in urls if x and ArtifactCache.expected_hash_of(x) is None
+            ])
+        except HashMismatch as e:
+            ui.error('Hash mismatch for', ui.bold(e.url))
+            sys.exit(1)
+
+        lockfile = self.locate_lockfile()
+        lockfile.write([
+            (pkg, url, self.artifact_cache.digest_of(url) if url else None)
+            for pkg, url in zip(pkgs, urls)
+        ])
+        ui.info('Locked', len(pkgs), 'packages in', ui.bold(str(lockfile)))
+
+    def perform_sync(self):
+        from .planner import Planner
+
+        lockfile = self.locate_lockfile()
+        if not os.path.exists(lockfile.path):
+            ui.error(lockfile.path, 'does not exist')
+            sys.exit(1)
+
+        graph = self.load_dependency_graph()
+        self.run_actions(Planner(graph).sync(lockfile.read()), graph)
+
     def perform_install_requirements(self):
         graph = self.load_dependency_graph()
         self.perform_install(graph.requirements.deps)
 
     def perform_install(self, deps, upgrade=False, save=False):
-        direct_deps = deps
-        install_queue = deps[:]
-        graph = self.load_dependency_graph()
-        while len(install_queue):
-            dep = install_queue.pop(0)
-
-            actions = list(Planner(graph, self.index).install(dep, upgrade=upgrade, downgrade=(dep in direct_deps), save=save))
-            self.run_actions(actions)
+        from .planner import Planner, InstallAction
 
-            graph = self.load_dependency_graph()
-            pkg = graph.match(dep)
-            if pkg:
-                for sub_dep in pkg.deps:
-                    if not sub_dep.resolved_to:
-                        install_queue.append(sub_dep)
+        graph = self.load_dependency_graph()
+        with self.make_installer() as installer:
+            planner = Planner(graph, self.index, metadata=installer)
+            with self.timings.span('resolve'):
+                actions = list(planner.resolve(deps, upgrade=upgrade, save=save))
+            self.run_actions(actions, graph, installer=installer)
+            if any(isinstance(x, InstallAction) for x in actions) and not self.show_timings:
+                ui.table(['Phase', 'Runs', 'Time'], self.timings.rows())
 
     def perform_download(self, deps, source=False):
-        for dep in deps:
-            candidates = self.index.candidates_for(dep, source=source)
+        from .downloads import ArtifactCache, HashMismatch
+
+        urls = []
+        for dep, candidates in zip(deps, self.index.candidates_for_many(deps, source=source)):
             best_candidate = self.index.best_candidate_of(dep, candidates)
             if not best_candidate:
                 ui.error('No packages available for', ui.dep(dep))
                 sys.exit(1)
+            urls.append(best_candidate.location.url)
 
-            url = best_candidate.location.url
-            name = os.path.basename(urlparse(url).path)
-            ui.info('Downloading', ui.bold(name))
-            urlretrieve(url, name)
+        for url in urls:
+            ui.info('Downloading', ui.bold(ArtifactCache.filename_of(url)))
+        try:
+            self.artifact_cache.fetch_many(urls)
+        except HashMismatch as e:
+            ui.error('Hash mismatch for', ui.bold(e.url))
+            sys.exit(1)
+        for url in urls:
+            self.artifact_cache.copy(url, os.getcwd())
 
     def perform_prune(self):
+        from .planner import Planner
+
         graph = self.load_dependency_graph()
-        self.run_actions(Planner(graph).prune())
+        self.run_actions(Planner(graph).prune(), graph)
 
     def perform_uninstall(self, packages):
+        from .planner import Planner
+
         graph = self.load_dependency_graph()
-        self.run_actions(Planner(graph).remove(packages))
+        self.run_actions(Planner(graph).remove(packages), graph)
 
-    def perform_list(self):
+    def perform_list(self, format='text'):
         pkgs = self.load_dependency_graph()
+        if format != 'text':
+            with ui.RecordWriter(format) as writer:
+                for pkg in pkgs:
+                    writer.write(ui.package_record(pkg, deps=True))
+            return
         ui.info(ui.bold(str(len(pkgs))), 'packages installed')
         for pkg in pkgs:
             print(' -', ui.pkg(pkg))
@@ -305,38 +484,39 @@ class App:
                 else:
                     print(ui.red('→ none'))
 
-    def perform_outdated(self):
+    def perform_outdated(self, format='text'):
+        from pip._vendor.packaging.requirements import Requirement
+        from .model import Dependency
+
         pkgs = self.load_dependency_graph()
         if self.requirements:
             deps = pkgs.requirements.deps
         else:
             deps = [Dependency(Requirement(x.name)) for x in pkgs]
 
-        def process_single(dep):
-            # TODO
-            pip.utils.logging._log_state.indentation = 0
-
-            installed = pkgs.find(dep.name)
-
-            if not installed:
-                return
-
-            candidates = self.index.candidates_for(dep)
+        deps = [x for x in deps if pkgs.find(x.name)]
 
-            best_candidate = self.index.best_candidate_of(dep, candidates)
-            best_release = self.index.best_candidate_of(None, candidates)
-
-            if best_release and (not installed or best_release.version > installed.version):
-                return (
-                    installed,
-                    best_candidate.version if best_candidate else None,
-                    best_release.version if best_release else None,
-                )
-
-        import click
-        with multiprocessing.pool.ThreadPool(processes=16) as pool:
-            with click.progressbar(pool.imap_unordered(process_single, deps), length=len(deps), label='Checking latest versions') as bar:
-                results = [x for x in bar if x]
+        if format != 'text':
+            all_candidates = self.index.candidates_for_many(deps)
+        else:
+            import click
+            with click.progressbar(length=len(deps), label='Checking latest versions') as bar:
+                all_candidates = self.index.candidates_for_many(deps, progress=lambda dep, candidates: bar.update(1))
+
+        results = []
+        for dep, candidates in zip(deps, all_candidates):
+            result = self.compare_latest(pkgs.find(dep.name), dep, candidates)
+            if result:
+                results.append(result)
+
+        if format != 'text':
+            with ui.RecordWriter(format) as writer:
+                for installed, best_candidate, best_release in sorted(results, key=lambda x: x[0]):
+                    record = ui.package_record(installed)
+                    record['available'] = str(best_candidate) if best_candidate else None
+                    record['latest'] = str(best_release) if best_release else None
+                    writer.write(record)
+            return
 
         rows = []
         for installed, best_candidate, best_release in sorted(results, key=lambda x: x[0]):
@@ -351,15 +531,83 @@ class App:
 
         ui.info(ui.bold(str(len(results))), 'outdated packages')
 
-    def perform_why(self, package):
+    def compare_latest(self, installed, dep, candidates):
+        best_candidate, best_release = self.index.best_candidates_of([dep, None], candidates)
+        if best_release and best_release.version > installed.version:
+            return (
+                installed,
+                best_candidate.version if best_candidate else None,
+                best_release.version,
+            )
+
+    def perform_scan(self, paths, outdated=False, format='text'):
+        from .model import Dependency, Package
+        from .scanner import scan
+
+        with self.timings.span('scan'):
+            projects = scan(paths, jobs=self.jobs)
+
+        if outdated:
+            # every project is looked up in the index once, however many venvs have it
+            names = sorted(set(
+                Dependency(x).name for project in projects if not project['error'] for x in project['wanted']
+            ))
+            all_candidates = dict(zip(names, self.index.candidates_for_many([Dependency(x) for x in names])))
+            for project in projects:
+                if project['error']:
+                    continue
+                project['outdated'] = []
+                for spec in project['wanted']:
+                    dep = Dependency(spec)
+                    if dep.name not in project['packages']:
+                        continue
+                    installed = Package(dep.name, project['packages'][dep.name])
+                    result = self.compare_latest(installed, dep, all_candidates[dep.name])
+                    if result:
+                        record = ui.package_record(installed)
+                        record['available'] = str(result[1]) if result[1] else None
+                        record['latest'] = str(result[2])
+                        project['outdated'].append(record)
+
+        for project in projects:
+            if not project['error']:
+                del project['wanted']
+                project['packages'] = len(project['packages'])
+
+        if format != 'text':
+            with ui.RecordWriter(format) as writer:
+                for project in projects:
+                    writer.write(project)
+            return
+
+        header = ['Project', 'Packages', 'Problems'] + (['Outdated'] if outdated else [])
+        rows = []
+        for project in projects:
+            if project['error']:
+                rows.append([ui.bold(project['path']), ui.red(project['error'])] + [''] * (len(header) - 2))
+                continue
+            row = [
+                ui.bold(project['path']),
+                str(project['packages']),
+                (ui.yellow if project['problems'] else ui.green)(str(len(project['problems']))),
+            ]
+            if outdated:
+                row.append((ui.cyan if project['outdated'] else ui.green)(str(len(project['outdated']))))
+            rows.append(row)
+        ui.table(header, rows)
+
+        failed = len([x for x in projects if x['error']])
+        ui.info(ui.bold(str(len(projects) - failed)), 'projects scanned')
+        if failed:
+            ui.warn(ui.bold(str(failed)), 'projects could not be scanned')
+
+    def perform_why(self, package, limit=None):
+        import itertools
+
         pkgs = self.load_dependency_graph()
         pkg = pkgs.find(package)
         if not pkg:
             ui.error(package, 'is not installed')
             sys.exit(1)
-        for dep in pkg.incoming:
-            print(ui.pkg(pkg), end='')
-            while dep:
-                print(' ←', ui.pkg(dep.parent), end='')
-                dep = (dep.parent.incoming + [None])[0]
-            print()
+        for path in itertools.islice(pkgs.why(pkg), limit):
+            print(' ← '.join(ui.pkg(x) for x in path))
@@ -18,6 +18,12 @@ class AliasedGroup(click.Group):
             return click.Group.get_command(self, ctx, matches[0])
         ctx.fail('Too many matches: %s' % ', '.join(sorted(matches)))
 
+    def resolve_command(self, ctx, args):
+        cmd_name, cmd, args = click.Group.resolve_command(self, ctx, args)
+        # the group callback runs before the subcommand parses these
+        ctx.meta['command_args'] = list(args)
+        return cmd_name, cmd, args
+
     def list_commands(self, ctx):
         commands = click.Group.list_commands(self, ctx)
         return sorted(commands + list(self.aliases))
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import multiprocessing.pool
+import os
+import shutil
+import threading
+from urllib.parse import urlparse, unquote
+
+from pip.index import InstallationCandidate, Link
+from pip.wheel import Wheel, InvalidWheelFilename
+from pip._vendor import requests
+from pip._vendor.packaging.utils import canonicalize_name
+from pip._vendor.packaging.version import parse as parse_version
+
+from .jsoncache import cache_path
+
+
+class HashMismatch(Exception):
+    def __init__(self, url, expected, actual):
+        Exception.__init__(self, url)
+        self.url = url
+        self.expected = expected
+        self.actual = actual
+
+
+class ArtifactCache:
+    '''
+    Downloaded artifacts stored by their sha256 digest, with an index from
+    URLs to digests. Interrupted downloads are resumed with range requests
+    '''
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, path=None, session=None, jobs=8):
+        self.path = path or cache_path('artifacts')
+        self.jobs = jobs
+        self.session = session
+        if not self.session:
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=jobs, pool_maxsize=jobs)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+    @staticmethod
+    def filename_of(url):
+        return unquote(os.path.basename(urlparse(url).path))
+
+    @staticmethod
+    def expected_hash_of(url):
+        # index links carry the digest in the fragment: #sha256=...
+        name, _, value = urlparse(url).fragment.partition('=')
+        if value and name in hashlib.algorithms_guaranteed:
+            return name, value
+
+    def key_of(self, url):
+        return hashlib.sha1(url.split('#')[0].encode()).hexdigest()
+
+    def artifact_path(self, digest, filename):
+        return os.path.join(self.path, 'sha256', digest[:2], digest, filename)
+
+    def get(self, url):
+        filename = ArtifactCache.filename_of(url)
+        expected = ArtifactCache.expected_hash_of(url)
+        if expected and expected[0] == 'sha256':
+            digest = expected[1]
+        else:
+            try:
+                with open(os.path.join(self.path, 'urls', self.key_of(url) + '.json')) as f:
+                    digest = json.load(f)['sha256']
+            except (OSError, ValueError, KeyError):
+                return None
+        path = self.artifact_path(digest, filename)
+        if os.path.exists(path):
+            return path
+
+    def fetch(self, url):
+        return self.get(url) or self.download(url)
+
+    def digest_of(self, url):
+        expected = ArtifactCache.expected_hash_of(url)
+        if expected and expected[0] == 'sha256':
+            return expected[1]
+        return os.path.basename(os.path.dirname(self.fetch(url)))
+
+    def fetch_many(self, urls):
+        unique = list(dict.fromkeys(urls))
+        if len(unique) < 2 or self.jobs == 1:
+            paths = [self.fetch(x) for x in unique]
+        else:
+            with multiprocessing.pool.ThreadPool(processes=min(self.jobs, len(unique))) as pool:
+                paths = pool.map(self.fetch, unique)
+        paths = dict(zip(unique, paths))
+        return [paths[x] for x in urls]
+
+    def download(self, url):
+        expected = ArtifactCache.expected_hash_of(url)
+        partial_dir = os.path.join(self.path, 'partial')
+        os.makedirs(partial_dir, exist_ok=True)
+        partial = os.path.join(partial_dir, self.key_of(url))
+
+        hashes = {'sha256': hashlib.sha256()}
+        if expected:
+            hashes.setdefault(expected[0], hashlib.new(expected[0]))
+
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        response = self.session.get(url.split('#')[0], headers=headers, stream=True)
+        if response.status_code == 416:
+            # the partial file is already complete or no longer matches
+            os.unlink(partial)
+            return self.download(url)
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            with open(partial, 'rb') as f:
+                for chunk in iter(lambda: f.read(ArtifactCache.CHUNK_SIZE), b''):
+                    for hash in hashes.values():
+                        hash.update(chunk)
+            mode = 'ab'
+        else:
+            mode = 'wb'
+
+        with open(partial, mode) as f:
+            for chunk in response.iter_content(ArtifactCache.CHUNK_SIZE):
+                for hash in hashes.values():
+                    hash.update(chunk)
+                f.write(chunk)
+
+        if expected and hashes[expected[0]].hexdigest() != expected[1]:
+            os.unlink(partial)
+            raise HashMismatch(url, expected[1], hashes[expected[0]].hexdigest())
+
+        digest = hashes['sha256'].hexdigest()
+        path = self.artifact_path(digest, ArtifactCache.filename_of(url))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(partial, path)
+        self.remember(url, digest)
+        return path
+
+    def remember(self, url, digest):
+        dir = os.path.join(self.path, 'urls')
+        os.makedirs(dir, exist_ok=True)
+        path = os.path.join(dir, self.key_of(url) + '.json')
+        tmp_path = '%s.%s.tmp' % (path, threading.get_ident())
+        with open(tmp_path, 'w') as f:
+            json.dump({'url': url, 'sha256': digest}, f)
+        os.replace(tmp_path, path)
+
+    def copy(self, url, dir):
+        path = self.fetch(url)
+        target = os.path.join(dir, os.path.basename(path))
+        shutil.copyfile(path, target)
+        return target
+
+
+class WheelCache:
+    '''
+    Downloaded and locally built wheels, one directory per project. The wheel
+    filename carries the version and tags, so lookups never touch the network
+    '''
+
+    def __init__(self, path=None):
+        self.path = path or cache_path('wheels')
+
+    def wheels_of(self, name):
+        dir = os.path.join(self.path, canonicalize_name(name))
+        try:
+            filenames = sorted(os.listdir(dir))
+        except OSError:
+            return []
+
+        result = []
+        for filename in filenames:
+            try:
+                wheel = Wheel(filename)
+            except InvalidWheelFilename:
+                continue
+            if wheel.supported():
+                result.append((wheel, os.path.join(dir, filename)))
+        return result
+
+    def find(self, name, version):
+        for wheel, path in self.wheels_of(name):
+            if parse_version(wheel.version) == version:
+                return path
+
+    def candidates_for(self, name):
+        return [
+            InstallationCandidate(name, wheel.version, Link('file://' + path))
+            for wheel, path in self.wheels_of(name)
+        ]
+
+    def put(self, path):
+        filename = os.path.basename(path)
+        try:
+            wheel = Wheel(filename)
+        except InvalidWheelFilename:
+            return path
+
+        dir = os.path.join(self.path, canonicalize_name(wheel.name))
+        target = os.path.join(dir, filename)
+        if not os.path.exists(target):
+            os.makedirs(dir, exist_ok=True)
+            tmp_path = '%s.%s.tmp' % (target, threading.get_ident())
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        return target
@@ -1,48 +1,269 @@
+import asyncio
+import hashlib
+import json
 import os
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import pip.utils.logging
 from pip.download import PipSession
-from pip.index import PackageFinder
+from pip.index import PackageFinder, HTMLPage, Link, Search, fmt_ctl_formats
 from pip.locations import USER_CACHE_DIR
+from pip._vendor.packaging.utils import canonicalize_name
+from pip._vendor.requests import RequestException
+
+import grip.ui as ui
+from .jsoncache import cache_path
+from .timings import Timings
+
+
+class CandidateCache:
+    '''
+    Candidate lists per project, kept in memory and as small JSON files
+    holding the page ETag, fetch time and every (url, requires-python) link
+    of the page. Links are only filtered for the running interpreter once
+    they are read, so the files can be shared between virtualenvs
+    '''
+
+    def __init__(self, path, to_candidates):
+        self.path = path
+        self.to_candidates = to_candidates
+        self.entries = {}
+        self.candidates = {}
+        self.lock = threading.Lock()
+
+    def file_for(self, name):
+        return os.path.join(self.path, name + '.json')
+
+    def get(self, name):
+        with self.lock:
+            if name in self.entries:
+                return self.entries[name]
+        try:
+            with open(self.file_for(name)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if 'links' not in entry:
+            # written by an older version, holding already filtered candidates
+            return None
+        with self.lock:
+            self.entries[name] = entry
+        return entry
+
+    def candidates_for(self, name):
+        with self.lock:
+            if name in self.candidates:
+                return self.candidates[name]
+            links = [Link(url, requires_python=requires_python) for url, requires_python in self.entries[name]['links']]
+        candidates = self.to_candidates(name, links)
+        with self.lock:
+            return self.candidates.setdefault(name, candidates)
+
+    def put(self, name, etag, links):
+        entry = {
+            'etag': etag,
+            'fetched': time.time(),
+            'links': [[x.url, x.requires_python] for x in links],
+        }
+        with self.lock:
+            self.entries[name] = entry
+            self.candidates.pop(name, None)
+        self.write(name, entry)
+        return self.candidates_for(name)
+
+    def touch(self, name):
+        entry = self.get(name)
+        entry['fetched'] = time.time()
+        self.write(name, entry)
+
+    def write(self, name, entry):
+        tmp_path = self.file_for(name) + '.%i.tmp' % threading.get_ident()
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(tmp_path, self.file_for(name))
+        except OSError:
+            pass
 
 
 class Index:
-    def __init__(self, url):
+    DEFAULT_CONCURRENCY = 16
+    CACHE_TTL = 600
+
+    def __init__(self, url, concurrency=DEFAULT_CONCURRENCY, cache_ttl=CACHE_TTL, cache_dir=None, wheels=None, offline=False, timings=None):
+        self.url = url
+        self.timings = timings or Timings()
+        self.wheels = wheels
+        self.offline = offline
+        # the HTTP cache is pip's own, so pages pip fetched before are reused
         self.session = PipSession(cache=os.path.join(USER_CACHE_DIR, 'http'))
         self.finder = PackageFinder(
             [],
             [url],
             session=self.session
         )
+        self.cache_ttl = cache_ttl
+        self.cache = None
+        if url:
+            self.cache = CandidateCache(os.path.join(
+                cache_dir or cache_path('candidates'),
+                hashlib.sha1(url.encode()).hexdigest()[:16],
+            ), self.candidates_from_links)
+        self.sorted_cache = {}
+        self.executor = None
+        self.set_concurrency(concurrency)
+
+    def set_concurrency(self, concurrency):
+        self.concurrency = concurrency
+        # keep one pooled keep-alive connection per worker instead of requests' default of 10
+        for adapter in set(self.session.adapters.values()):
+            if hasattr(adapter, 'init_poolmanager'):
+                adapter.init_poolmanager(concurrency, concurrency)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
 
     def candidates_for(self, dep, source=False):
-        candidates = self.finder.find_all_candidates(dep.name)
+        with self.timings.span('candidates_for'):
+            return self.find_candidates(dep, source=source)
+
+    def find_candidates(self, dep, source=False):
+        if self.offline:
+            # only what has been downloaded or built before
+            return [] if source or not self.wheels else self.wheels.candidates_for(dep.name)
+        if self.cache:
+            candidates = self.cached_candidates_for(canonicalize_name(dep.name))
+        else:
+            candidates = self.finder.find_all_candidates(dep.name)
         if source:
             candidates = [x for x in candidates if not x.location.is_wheel]
         return candidates
 
+    def cached_candidates_for(self, name):
+        entry = self.cache.get(name)
+        if entry and time.time() - entry['fetched'] < self.cache_ttl:
+            return self.cache.candidates_for(name)
+
+        headers = {'Accept': 'text/html'}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        try:
+            response = self.session.get(posixpath.join(self.url, quote(name)) + '/', headers=headers)
+            if response.status_code >= 500:
+                raise RequestException('HTTP %i' % response.status_code)
+        except RequestException as e:
+            if entry:
+                return self.cache.candidates_for(name)
+            # like pip, an unreachable page lists nothing, but that is not worth remembering
+            ui.warn('Could not fetch the index page of', ui.bold(name) + ':', str(e))
+            return []
+
+        etag = response.headers.get('ETag')
+        # the HTTP cache layer may turn a 304 into the stored 200, hence the ETag comparison
+        if entry and (response.status_code == 304 or (etag and etag == entry['etag'])):
+            self.cache.touch(name)
+            return self.cache.candidates_for(name)
+
+        links = []
+        # like pip, treat error responses and non-HTML pages as listing nothing
+        if response.status_code == 200 and response.headers.get('Content-Type', '').lower().startswith('text/html'):
+            links = list(HTMLPage(response.content, response.url, response.headers).links)
+        return self.cache.put(name, etag, links)
+
+    def candidates_from_links(self, name, links):
+        search = Search(name, name, fmt_ctl_formats(self.finder.format_control, name))
+        return self.finder._package_versions(links, search)
+
+    async def fetch_candidates(self, deps, source=False, progress=None):
+        if not self.executor:
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        loop = asyncio.get_event_loop()
+
+        def fetch_sync(dep):
+            # pip keeps the log indentation in a thread local
+            pip.utils.logging._log_state.indentation = 0
+            return self.candidates_for(dep, source=source)
+
+        async def fetch(dep):
+            candidates = await loop.run_in_executor(self.executor, fetch_sync, dep)
+            if progress:
+                progress(dep, candidates)
+            return candidates
+
+        return await asyncio.gather(*(fetch(dep) for dep in deps))
+
+    def candidates_for_many(self, deps, source=False, progress=None):
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            return loop.run_until_complete(self.fetch_candidates(deps, source=source, progress=progress))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def sorted_candidates(self, candidates):
+        # candidate lists come from the cache and are long-lived, so their order is only computed once
+        key = id(candidates)
+        entry = self.sorted_cache.get(key)
+        if not entry or entry[0] is not candidates:
+            entry = (candidates, sorted(candidates, key=self.finder._candidate_sort_key, reverse=True))
+            self.sorted_cache[key] = entry
+        return entry[1]
+
     def best_candidate_of(self, dep, candidates):
-        if dep:
-            compatible_versions = set(
-                dep.req.specifier.filter(
-                    [str(c.version) for c in candidates],
-                    prereleases=False
-                )
-            )
-
-            if len(compatible_versions) == 0:
-                compatible_versions = set(
-                    dep.req.specifier.filter(
-                        [str(c.version) for c in candidates],
-                        prereleases=True
-                    )
-                )
-
-            applicable_candidates = [
-                c for c in candidates if str(c.version) in compatible_versions
-            ]
-        else:
-            applicable_candidates = candidates
+        candidates = self.sorted_candidates(candidates)
+        if not dep:
+            return candidates[0] if len(candidates) else None
 
-        if not len(applicable_candidates):
-            return None
+        specifier = dep.compiled_specifier
+        for prereleases in (False, True):
+            for candidate in candidates:
+                if specifier.contains(candidate.version, prereleases=prereleases):
+                    return candidate
+
+    def best_candidates_of(self, deps, candidates):
+        '''
+        Picks the best candidate for each of the dependencies from one list,
+        sorting it once and matching each distinct specifier against all
+        versions in one go
+        '''
+        candidates = self.sorted_candidates(candidates)
+        versions = []
+        for candidate in candidates:
+            if not versions or versions[-1][0] != candidate.version:
+                versions.append((candidate.version, candidate))
+        ascending = [v for v, c in reversed(versions)]
+
+        best = {}
+        result = []
+        for dep in deps:
+            if not dep:
+                result.append(candidates[0] if len(candidates) else None)
+                continue
+
+            specifier = dep.compiled_specifier
+            key = id(specifier)
+            if key not in best:
+                matches = specifier.mask(ascending)[::-1]
+                best[key] = next((c for (v, c), m in zip(versions, matches) if m and not v.is_prerelease), None)
+                if not best[key]:
+                    best[key] = next((c for (v, c), m in zip(versions, matches) if m), None)
+            result.append(best[key])
+        return result
 
-        return max(applicable_candidates, key=self.finder._candidate_sort_key)
+    def sorted_candidates_of(self, deps, candidates):
+        result = []
+        releases = []
+        for candidate in self.sorted_candidates(candidates):
+            if result and result[-1].version == candidate.version:
+                continue
+            if all(dep.matches_version(candidate.version) for dep in deps):
+                result.append(candidate)
+                if not candidate.version.is_prerelease:
+                    releases.append(candidate)
+        return releases or result
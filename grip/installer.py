@@ -0,0 +1,180 @@
+import email.parser
+import multiprocessing.pool
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from pip._vendor.packaging.requirements import Requirement
+
+import grip.ui as ui
+from .downloads import ArtifactCache, HashMismatch, WheelCache
+from .model import Package
+from .planner import InstallAction
+from .timings import Timings
+
+
+def wheel_requirements(path, extras=()):
+    with zipfile.ZipFile(path) as wheel:
+        for name in wheel.namelist():
+            if name.count('/') == 1 and name.endswith('.dist-info/METADATA'):
+                metadata = email.parser.Parser().parsestr(wheel.read(name).decode('utf-8'))
+                break
+        else:
+            return []
+
+    result = []
+    for line in metadata.get_all('Requires-Dist') or []:
+        req = Requirement(line)
+        if req.marker and not any(req.marker.evaluate({'extra': extra}) for extra in [''] + list(extras)):
+            continue
+        req.marker = None
+        result.append(str(req))
+    return result
+
+
+class Installer:
+    def __init__(self, prefix, index_url=None, jobs=None, cache=None, wheels=None, offline=False, timings=None):
+        self.prefix = prefix
+        self.index_url = index_url
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache = cache or ArtifactCache(jobs=self.jobs)
+        self.wheels = wheels or WheelCache()
+        self.offline = offline
+        self.timings = timings or Timings()
+        self.artifacts = {}
+        self.dir = None
+
+    def __enter__(self):
+        self.dir = tempfile.mkdtemp(prefix='grip-')
+        return self
+
+    def __exit__(self, *args):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def pip(self, *args):
+        command = [sys.executable, '-m', 'pip', '-q', *args]
+        if self.offline:
+            command += ['--no-index']
+        elif self.index_url:
+            command += ['--index-url', self.index_url]
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        return process.returncode, process.stdout.decode(errors='replace')
+
+    def map(self, fx, items):
+        if len(items) < 2 or self.jobs == 1:
+            return [fx(x) for x in items]
+        with multiprocessing.pool.ThreadPool(processes=min(self.jobs, len(items))) as pool:
+            return pool.map(fx, items)
+
+    def requirements_for(self, dep):
+        self.prepare([InstallAction(dep)])
+        return wheel_requirements(self.artifacts[str(dep)], extras=dep.req.extras)
+
+    def prefetch(self, deps):
+        self.prepare([InstallAction(x) for x in deps])
+
+    def prepare(self, actions):
+        actions = [x for x in actions if str(x.dependency) not in self.artifacts]
+        for action in actions:
+            dep = action.dependency
+            # a lock file pins the artifact's hash, which a cached (possibly locally built) wheel can't vouch for.
+            # Pinned wheels are still found in the artifact cache by their digest
+            if dep.potential_candidate and not ArtifactCache.expected_hash_of(dep.potential_candidate.location.url):
+                path = self.wheels.find(dep.name, dep.potential_candidate.version)
+                if path:
+                    self.artifacts[str(dep)] = path
+        actions = [x for x in actions if str(x.dependency) not in self.artifacts]
+
+        with self.timings.span('download'):
+            downloads = [x for x in actions if x.dependency.potential_candidate]
+            try:
+                paths = self.map(self.download, downloads)
+            except HashMismatch as e:
+                ui.error('Hash mismatch for', ui.bold(e.url))
+                sys.exit(1)
+            for action, path in zip(downloads, paths):
+                self.artifacts[str(action.dependency)] = path
+
+        with self.timings.span('build'):
+            builds = [x for x in actions if not self.artifacts.get(str(x.dependency), '').endswith('.whl')]
+            # worker threads can't exit the process, so failures are reported here
+            for action, code, output, path in self.map(self.build, builds):
+                if code != 0:
+                    sys.stderr.write(output)
+                    ui.error('Could not build', ui.dep(action.dependency))
+                    sys.exit(1)
+                self.artifacts[str(action.dependency)] = path
+
+        for action in actions:
+            self.artifacts[str(action.dependency)] = self.wheels.put(self.artifacts[str(action.dependency)])
+
+    def download(self, action):
+        url = action.dependency.potential_candidate.location.url
+        if url.startswith('file://'):
+            return url[len('file://'):]
+        path = self.cache.get(url)
+        if not path:
+            ui.info('Downloading', ui.bold(ArtifactCache.filename_of(url)))
+            path = self.cache.download(url)
+        return path
+
+    def build(self, action):
+        dep = action.dependency
+        source = self.artifacts.get(str(dep), str(dep))
+        wheel_dir = tempfile.mkdtemp(dir=self.dir)
+        ui.info('Building', ui.dep(dep))
+        code, output = self.pip('wheel', '--no-deps', '--wheel-dir', wheel_dir, source)
+        if code != 0:
+            return action, code, output, None
+        return action, code, output, os.path.join(wheel_dir, os.listdir(wheel_dir)[0])
+
+    def levels(self, actions):
+        # packages only go after their own dependencies, everything else is installed side by side
+        by_name = {x.dependency.name: x for x in actions}
+        children = {}
+        for name, action in by_name.items():
+            names = (Package.sanitize_name(Requirement(x).name) for x in self.requirements_for(action.dependency))
+            children[name] = [x for x in names if x in by_name]
+        depth = {}
+
+        def visit(name, path):
+            if name not in depth:
+                depth[name] = 0
+                depth[name] = 1 + max(
+                    [visit(x, path | {name}) for x in children[name] if x not in path] or [-1]
+                )
+            return depth[name]
+
+        for name in by_name:
+            visit(name, set())
+
+        result = [[] for _ in range(max(depth.values()) + 1)]
+        for name, action in by_name.items():
+            result[depth[name]].append(action)
+        return result
+
+    def install(self, actions):
+        self.prepare(actions)
+
+        def install_one(action):
+            ui.info('Installing', ui.dep(action.dependency))
+            code, output = self.pip(
+                'install',
+                '--no-deps',
+                '--prefix', self.prefix,
+                '--ignore-installed',
+                '--upgrade',
+                self.artifacts[str(action.dependency)],
+            )
+            return action, code, output
+
+        with self.timings.span('install'):
+            for level in self.levels(actions):
+                for action, code, output in self.map(install_one, level):
+                    if code != 0:
+                        sys.stderr.write(output)
+                        ui.error('Could not install', ui.dep(action.dependency))
+                        sys.exit(1)
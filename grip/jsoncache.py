@@ -0,0 +1,56 @@
+import json
+import os
+
+
+def cache_path(*parts):
+    '''
+    Returns a path inside grip's cache directory, which follows XDG_CACHE_HOME
+    '''
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'grip', *parts)
+
+
+class JsonCache:
+    '''
+    A dict of entries kept in a single JSON file, which is only read on first
+    use and replaced atomically on save(). Bump VERSION to drop old files
+    '''
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = None
+        self.dirty = False
+
+    def load(self):
+        self.entries = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self.entries = data.get('entries', {})
+
+    def get_entry(self, key):
+        if self.entries is None:
+            self.load()
+        return self.entries.get(key)
+
+    def put_entry(self, key, entry):
+        if self.entries is None:
+            self.load()
+        self.entries[key] = entry
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': self.VERSION, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+        self.dirty = False
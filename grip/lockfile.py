@@ -0,0 +1,53 @@
+import json
+import os
+
+from pip.index import InstallationCandidate, Link
+
+from .model import Package, Dependency
+
+
+class Lockfile:
+    '''
+    Exact versions of every installed package together with the artifact URL
+    and its sha256, enough to recreate the environment without an index
+    '''
+    FILENAME = 'grip.lock'
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        with open(self.path) as f:
+            data = json.load(f)
+
+        deps = []
+        for name, entry in data['packages'].items():
+            dep = Dependency.exact(Package(name, entry['version']))
+            if entry['url']:
+                url = entry['url'].split('#')[0] + '#sha256=' + entry['sha256']
+                dep.potential_candidate = InstallationCandidate(name, entry['version'], Link(url))
+            deps.append(dep)
+        return deps
+
+    def write(self, entries):
+        # entries are (package, url, sha256)
+        data = {
+            'version': Lockfile.VERSION,
+            'packages': {
+                pkg.name: {
+                    'version': str(pkg.version),
+                    'url': url,
+                    'sha256': sha256,
+                }
+                for pkg, url, sha256 in sorted(entries, key=lambda x: x[0].name)
+            },
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(tmp_path, self.path)
+
+    def __str__(self):
+        return self.path
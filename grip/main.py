@@ -4,7 +4,6 @@ import sys
 import grip.ui as ui
 from .app import App
 from .cli import AliasedGroup
-from .model import PackageGraph, Package, Dependency
 from .requirements import TxtRequirements
 
 app = App()
@@ -13,21 +12,72 @@ ALIASES = {
     'ls': 'list',
     'remove': 'uninstall',
 }
+format_option = click.option(
+    '--format', 'format', type=click.Choice(ui.FORMATS), default='text',
+    help='Output format, json and ndjson are meant for scripts',
+)
 
 @click.group(cls=AliasedGroup, context_settings=CONTEXT_SETTINGS, aliases=ALIASES)
 @click.option('--global', '-g', 'glob', is_flag=True, default=False, help='Act on the global site, not the local virtualenv')
 @click.option('--cwd', '-d', default=None, help='Working directory')
 @click.option('--interactive/--noninteractive', '-i/-n', default=lambda: os.isatty(0), help='Allow user interaction')
 @click.option('--requirements', '-r', 'requirements_path', default=None, help='Requirements file')
-def cli(glob=False, cwd=None, interactive=False, requirements_path=None):
+@click.option('--concurrency', type=int, default=None, help='Maximum number of parallel index requests')
+@click.option('--offline', is_flag=True, default=False, help='Only use wheels from the local wheel cache')
+@click.option('--timings', 'show_timings', is_flag=True, default=False, help='Print how long each phase took')
+@click.option('--profile', 'profile_path', default=None, help='Write cProfile stats to this file')
+@click.option('--trace', 'trace_path', default=None, help='Write a Chrome trace of the timed phases to this file')
+@click.pass_context
+def cli(ctx, glob=False, cwd=None, interactive=False, requirements_path=None, concurrency=None, offline=False,
+        show_timings=False, profile_path=None, trace_path=None):
     if requirements_path:
         requirements_path = os.path.abspath(requirements_path)
+    if profile_path:
+        profile_path = os.path.abspath(profile_path)
+    if trace_path:
+        trace_path = os.path.abspath(trace_path)
+
+    command = ctx.invoked_subcommand and cli.get_command(ctx, ctx.invoked_subcommand)
+    # with json output, stdout is reserved for the records
+    machine_format = command and format_of(ctx, command) not in (None, 'text')
+    ui.set_log_file(sys.stderr if machine_format else None)
 
     if cwd:
         os.chdir(cwd)
         ui.debug('Working in', os.getcwd())
 
     app.interactive = interactive
+    app.concurrency = concurrency
+    app.set_offline(offline)
+
+    if profile_path:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+
+        def write_profile():
+            profile.disable()
+            profile.dump_stats(profile_path)
+        ctx.call_on_close(write_profile)
+
+    if trace_path:
+        ctx.call_on_close(lambda: app.timings.write_trace(trace_path))
+
+    if show_timings:
+        app.show_timings = True
+
+        def print_timings():
+            if app.timings.spans:
+                ui.table(['Phase', 'Runs', 'Time'], app.timings.rows(), file=sys.stderr if machine_format else None)
+        ctx.call_on_close(print_timings)
+
+    if machine_format:
+        # stderr may be block-buffered when it isn't a terminal
+        ctx.call_on_close(sys.stderr.flush)
+
+    if command and command.name == 'run':
+        # run only needs the virtualenv, not the requirements
+        return
 
     '''
     if glob:
@@ -51,6 +101,18 @@ def cli(glob=False, cwd=None, interactive=False, requirements_path=None):
         ui.debug('Requirements file:', app.requirements)
 
 
+def format_of(ctx, command):
+    '''
+    Peeks at the --format option of the subcommand, which is only parsed
+    after this group callback has run
+    '''
+    if not any(x.name == 'format' for x in command.params):
+        return None
+    args = ctx.meta.get('command_args', [])
+    sub_ctx = command.make_context(ctx.invoked_subcommand, list(args), parent=ctx, resilient_parsing=True)
+    return sub_ctx.params.get('format')
+
+
 @cli.command('init', help='Set up a new project')
 def cmd_init():
     '''
@@ -72,12 +134,13 @@ def cmd_run(command=None, args=[]):
 
 
 @cli.command('check', help='Check consistency')
-def cmd_check():
+@format_option
+def cmd_check(format='text'):
     '''
     Checks all dependencies for consistency and looks for extraneous packages
     '''
     app.ensure_virtualenv()
-    app.perform_check()
+    app.perform_check(format=format)
 
 
 @cli.command('prune', help='Remove extraneous packages')
@@ -91,19 +154,40 @@ def cmd_prune():
 
 
 @cli.command('freeze', help='List all packages')
-def cmd_freeze():
+@format_option
+def cmd_freeze(format='text'):
     '''
     Lists every installed package and its version
     '''
     app.ensure_virtualenv()
-    app.perform_freeze()
+    app.perform_freeze(format=format)
+
+
+@cli.command('lock', help='Write a lockfile')
+def cmd_lock():
+    '''
+    Records the exact version, URL and hash of every installed package in grip.lock
+    '''
+    app.ensure_virtualenv()
+    app.perform_lock()
+
+
+@cli.command('sync', help='Install exactly what the lockfile lists')
+def cmd_sync():
+    '''
+    Installs and removes packages until the virtualenv matches grip.lock.
+    The package index is not consulted
+    '''
+    app.ensure_virtualenv()
+    app.perform_sync()
 
 
 @cli.command('install', help='Install dependencies')
 @click.argument('packages', metavar='<dependencies>', nargs=-1)
 @click.option('--save', '-S', is_flag=True, help='Add to the requirements file')
 @click.option('--upgrade', '-U', is_flag=True, help='Upgrade already installed packages')
-def cmd_install(packages=None, save=False, upgrade=False):
+@click.option('--jobs', '-j', type=int, default=None, help='Number of parallel downloads and installs')
+def cmd_install(packages=None, save=False, upgrade=False, jobs=None):
     '''
     Installs listed dependencies
 
@@ -119,6 +203,9 @@ def cmd_install(packages=None, save=False, upgrade=False):
 
       grip -r reqs-test.txt install
     '''
+    from .model import PackageGraph, Package, Dependency
+
+    app.jobs = jobs
     app.ensure_virtualenv()
     if len(packages):
         parent = Package(PackageGraph.USER_PKG, None)
@@ -142,6 +229,8 @@ def cmd_download(dependencies=None, source=False):
 
      grip download django==2.0
     '''
+    from .model import Dependency
+
     app.perform_download([Dependency(x) for x in dependencies], source=source)
 
 
@@ -162,33 +251,59 @@ def cmd_uninstall(packages=None):
 
 
 @cli.command('list', help='List installed packages')
-def cmd_list():
+@format_option
+def cmd_list(format='text'):
     '''
     Lists installed packages and their dependencies
     '''
     app.ensure_virtualenv()
-    app.perform_list()
-    app.perform_check(silent=True)
+    app.perform_list(format=format)
+    if format == 'text':
+        app.perform_check(silent=True)
 
 
 @cli.command('outdated', help='Check for updates')
-def cmd_outdated():
+@format_option
+def cmd_outdated(format='text'):
     '''
     Checks for the newest versions of the installed packages
     '''
     app.ensure_virtualenv()
-    app.perform_outdated()
+    app.perform_outdated(format=format)
+
+
+@cli.command('scan', help='Check many projects at once')
+@click.argument('paths', nargs=-1, required=True, metavar='<directories>')
+@click.option('--outdated', is_flag=True, help='Also check for updates')
+@click.option('--jobs', '-j', type=int, default=None, help='Number of projects to load in parallel')
+@format_option
+def cmd_scan(paths=None, outdated=False, jobs=None, format='text'):
+    '''
+    Checks the virtualenvs of several project directories for dependency
+    problems (and updates) and prints a combined report
+
+    Example:
+
+     grip scan services/*
+
+     grip scan --outdated --format ndjson services/*
+    '''
+    app.jobs = jobs
+    app.perform_scan(paths, outdated=outdated, format=format)
 
 
 @cli.command('why', help='Figure out the dependency chain')
 @click.argument('package', metavar='<package>')
-def cmd_why(package=None):
+@click.option('--limit', type=int, default=None, help='Only show this many of the shortest chains')
+def cmd_why(package=None, limit=None):
     '''
     Figures out why a package was installed and what depends on it
 
     Example:
 
      grip why six
+
+     grip why six --limit 3
     '''
     app.ensure_virtualenv()
-    app.perform_why(package)
+    app.perform_why(package, limit=limit)
@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+
+
+class MetadataCache:
+    FILENAME = '.grip-metadata.json'
+    VERSION = 1
+
+    def __init__(self, site_packages):
+        self.path = os.path.join(site_packages, MetadataCache.FILENAME)
+        self.python = '%s.%s' % sys.version_info[:2]
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') == MetadataCache.VERSION and data.get('python') == self.python:
+            self.entries = data.get('entries', {})
+
+    def get(self, key, mtime):
+        entry = self.entries.get(key)
+        if entry and entry['mtime'] == mtime:
+            return entry
+
+    def put(self, key, mtime, name, version, requires):
+        self.entries[key] = {
+            'mtime': mtime,
+            'name': name,
+            'version': version,
+            'requires': requires,
+        }
+        self.dirty = True
+
+    def set_requires(self, key, requires):
+        self.entries[key]['requires'] = requires
+        self.dirty = True
+
+    def prune(self, keys):
+        for key in set(self.entries) - set(keys):
+            del self.entries[key]
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'version': MetadataCache.VERSION,
+                    'python': self.python,
+                    'entries': self.entries,
+                }, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # read-only site-packages, just go without a cache
+            pass
+        self.dirty = False
@@ -1,19 +1,31 @@
+import re
+
 import pkg_resources
 from pip.req.req_install import InstallRequirement
 from pip._vendor.packaging.requirements import Requirement
 
 from .package import Package
+from .specifier import CompiledSpecifier
 
 
 class Dependency:
+    __slots__ = ('url', '_req', '_spec', '_name', '_compiled', 'parent', 'resolved_to', 'potential_candidate')
+    NAME_REGEX = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+    SPECIFIERS = {}
+
     def __init__(self, req, parent=None):
         self.url = None
+        self._req = None
+        self._spec = None
+        self._name = None
+        self._compiled = None
         if isinstance(req, InstallRequirement):
             self.req = req.req
             if req.link:
                 self.url = req.link.url
         elif isinstance(req, str):
-            self.req = Requirement(req)
+            # parsed on first use, most dependencies only ever need a name
+            self._spec = req
         elif isinstance(req, pkg_resources.Requirement):
             self.req = req
         else:
@@ -27,16 +39,44 @@ class Dependency:
     def exact(package):
         return Dependency(f'{package.name}=={package.version}')
 
+    @property
+    def req(self):
+        if self._req is None:
+            self.req = Requirement(self._spec)
+        return self._req
+
+    @req.setter
+    def req(self, req):
+        # equal specifiers are shared between all dependencies that use them, and compiled once
+        self._compiled = None
+        if req is not None:
+            key = (type(req.specifier), str(req.specifier))
+            if key not in Dependency.SPECIFIERS:
+                Dependency.SPECIFIERS[key] = (req.specifier, CompiledSpecifier(req.specifier))
+            req.specifier, self._compiled = Dependency.SPECIFIERS[key]
+        self._req = req
+        self._spec = None
+        self._name = None
+
     @property
     def name(self):
-        return Package.sanitize_name(self.req.name)
+        if self._name is None:
+            match = Dependency.NAME_REGEX.match(self._spec) if self._req is None else None
+            self._name = Package.sanitize_name(match.group(1) if match else self.req.name)
+        return self._name
 
     @property
     def specifier(self):
         return self.req.specifier
 
+    @property
+    def compiled_specifier(self):
+        if self._req is None:
+            self.req = Requirement(self._spec)
+        return self._compiled
+
     def matches_version(self, version):
-        return len(list(self.req.specifier.filter([str(version)]))) > 0
+        return self.compiled_specifier.contains(version, prereleases=True)
 
     def __str__(self):
         if self.url:
@@ -1,8 +1,12 @@
+import bisect
+import functools
+import heapq
 import os
 import pkg_resources
 
 from .package import Package
 from .dependency import Dependency
+from .cache import MetadataCache
 
 
 class PackageGraph(list):
@@ -12,9 +16,68 @@ class PackageGraph(list):
 
     def __init__(self, items=[], requirements=[]):
         list.__init__(self, items)
+        self.by_name = {}
+        self.edges = {}
+        self.metadata_cache = None
+        self.depths = None
+        self.reindex()
         self.requirements = Package(PackageGraph.PROJECT_PKG, None)
         self.set_requirements(requirements)
 
+    def reindex(self):
+        self.by_name = {}
+        for pkg in self:
+            self.by_name.setdefault(pkg.name, []).append(pkg)
+
+    def append(self, pkg):
+        list.append(self, pkg)
+        self.by_name.setdefault(pkg.name, []).append(pkg)
+
+    def extend(self, pkgs):
+        for pkg in pkgs:
+            self.append(pkg)
+
+    def __iadd__(self, pkgs):
+        self.extend(pkgs)
+        return self
+
+    def remove(self, pkg):
+        # list.remove() compares by name, so it always drops the first package of that name
+        list.remove(self, pkg)
+        bucket = self.by_name[pkg.name]
+        bucket.pop(0)
+        if not bucket:
+            del self.by_name[pkg.name]
+
+    def insert(self, index, pkg):
+        list.insert(self, index, pkg)
+        self.reindex()
+
+    def pop(self, index=-1):
+        pkg = list.pop(self, index)
+        self.reindex()
+        return pkg
+
+    def clear(self):
+        list.clear(self)
+        self.by_name = {}
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.reindex()
+
+    def reverse(self):
+        list.reverse(self)
+        self.reindex()
+
+    def __setitem__(self, index, value):
+        list.__setitem__(self, index, value)
+        self.reindex()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self.reindex()
+
     def set_requirements(self, deps):
         deps = list(deps)
         for dep in deps:
@@ -22,38 +85,194 @@ class PackageGraph(list):
         self.requirements.deps = sorted(deps)
 
     @staticmethod
-    def from_directory(site_packages):
+    def from_directory(site_packages, cache=True):
+        metadata_cache = MetadataCache(site_packages) if cache else None
+        pkgs = []
+        dist_infos = [x for x in os.listdir(site_packages) if x.endswith('.dist-info')]
+        for dir in dist_infos:
+            pkgs += PackageGraph.load_packages(site_packages, dir, cache=metadata_cache)
+
+        if metadata_cache:
+            metadata_cache.prune(dist_infos)
+            metadata_cache.save()
+
+        graph = PackageGraph(sorted(pkgs))
+        graph.metadata_cache = metadata_cache
+        return graph
+
+    @staticmethod
+    def load_packages(site_packages, dir, cache=None):
+        # names and versions come from the directory name, requirements are only read once needed
+        dist_info = os.path.join(site_packages, dir)
+        mtime = entry = None
+        if cache:
+            mtime = os.stat(dist_info).st_mtime_ns
+            entry = cache.get(dir, mtime)
+
+        if entry:
+            dists = [pkg_resources.Distribution.from_location(
+                site_packages, dir,
+                pkg_resources.PathMetadata(site_packages, dist_info),
+            )]
+        else:
+            dists = pkg_resources.distributions_from_metadata(dist_info)
+
         pkgs = []
-        for dir in os.listdir(site_packages):
-            if dir.endswith('.dist-info'):
-                dist_info = os.path.join(site_packages, dir)
-                dists = pkg_resources.distributions_from_metadata(dist_info)
-                for dist in dists:
-                    pkg = Package.from_distribution(dist)
-                    pkg.deps = sorted((Dependency(x, pkg) for x in dist.requires()), key=lambda x: str(x))
-                    pkgs.append(pkg)
+        for dist in dists:
+            if entry:
+                pkg = Package(entry['name'], entry['version'], metadata=dist)
+            else:
+                pkg = Package.from_distribution(dist)
+                if cache:
+                    cache.put(dir, mtime, dist.project_name, dist.version, None)
+            pkg.deps_loader = functools.partial(PackageGraph.load_deps, dist, dir, cache)
+            pkgs.append(pkg)
+        return pkgs
 
-        return PackageGraph(sorted(pkgs))
+    @staticmethod
+    def load_deps(dist, dir, cache, pkg):
+        entry = cache.entries.get(dir) if cache else None
+        if entry and entry['requires'] is not None:
+            requires = entry['requires']
+        else:
+            requires = sorted(str(x) for x in dist.requires())
+            if entry:
+                cache.set_requires(dir, requires)
+        return [Dependency(x, pkg) for x in requires]
 
     def find(self, name):
-        name = Package.sanitize_name(name)
-        for pkg in self:
-            if pkg.name == name:
-                return pkg
+        pkgs = self.by_name.get(Package.sanitize_name(name))
+        if pkgs:
+            return pkgs[0]
 
     def match(self, dep):
-        for pkg in self:
-            if pkg.name == dep.name and dep.matches_version(pkg.version):
+        for pkg in self.by_name.get(dep.name, ()):
+            if dep.matches_version(pkg.version):
                 return pkg
 
     def resolve_dependencies(self):
+        self.edges = {}
+        self.depths = None
+        for pkg in self:
+            pkg.incoming = []
+            pkg.incoming_mismatched = []
+
         for pkg in self + [self.requirements]:
             for dep in pkg.deps:
-                dep.resolved_to = None
-                for candidate in self:
-                    if candidate.name == dep.name:
-                        if dep.matches_version(candidate.version):
-                            dep.resolved_to = candidate
-                            candidate.incoming.append(dep)
-                        else:
-                            candidate.incoming_mismatched.append(dep)
+                self.edges.setdefault(dep.name, []).append(dep)
+                self.resolve(dep)
+
+        if self.metadata_cache:
+            self.metadata_cache.save()
+
+    def resolve(self, dep):
+        dep.resolved_to = None
+        for candidate in self.by_name.get(dep.name, ()):
+            if dep.matches_version(candidate.version):
+                dep.resolved_to = candidate
+                candidate.incoming.append(dep)
+            else:
+                candidate.incoming_mismatched.append(dep)
+
+    def patch(self, added=[], removed=[], requirements=None):
+        '''
+        Updates a resolved graph after packages were installed or removed, or
+        the project requirements changed (when `requirements` is given)
+        '''
+        # only edges pointing at the touched names need to be resolved again
+        self.depths = None
+        names = set()
+        for pkg in removed:
+            if not self.discard(pkg):
+                continue
+            names.add(pkg.name)
+            self.remove_edges(pkg.deps, names)
+
+        if requirements is not None:
+            self.remove_edges(self.requirements.deps, names)
+            self.set_requirements(requirements)
+            self.add_edges(self.requirements.deps, names)
+
+        for pkg in added:
+            list.insert(self, bisect.bisect_right(self, pkg), pkg)
+            self.by_name.setdefault(pkg.name, []).append(pkg)
+            names.add(pkg.name)
+            self.add_edges(pkg.deps, names)
+
+        for name in names:
+            for candidate in self.by_name.get(name, ()):
+                candidate.incoming = []
+                candidate.incoming_mismatched = []
+            for dep in self.edges.get(name, ()):
+                self.resolve(dep)
+
+    def remove_edges(self, deps, names):
+        for dep in deps:
+            edges = self.edges.get(dep.name, [])
+            for index, edge in enumerate(edges):
+                if edge is dep:
+                    del edges[index]
+                    break
+            names.add(dep.name)
+
+    def add_edges(self, deps, names):
+        for dep in deps:
+            self.edges.setdefault(dep.name, []).append(dep)
+            names.add(dep.name)
+
+    def discard(self, pkg):
+        bucket = self.by_name.get(pkg.name, [])
+        if not any(x is pkg for x in bucket):
+            return False
+
+        index = bisect.bisect_left(self, pkg)
+        while index < len(self) and self[index] == pkg and self[index] is not pkg:
+            index += 1
+        if index == len(self) or self[index] is not pkg:
+            index = next(i for i, x in enumerate(self) if x is pkg)
+        list.__delitem__(self, index)
+
+        bucket[:] = [x for x in bucket if x is not pkg]
+        if not bucket:
+            del self.by_name[pkg.name]
+        return True
+
+    def is_root(self, pkg):
+        return pkg is self.requirements or not (pkg.incoming or pkg.incoming_mismatched)
+
+    def root_depths(self):
+        # how many edges every package is away from the closest root, computed once per resolution
+        if self.depths is None:
+            self.depths = {}
+            queue = [x for x in self + [self.requirements] if self.is_root(x)]
+            for pkg in queue:
+                self.depths[id(pkg)] = 0
+            for pkg in queue:
+                for dep in pkg.deps:
+                    for target in self.by_name.get(dep.name, ()):
+                        if id(target) not in self.depths:
+                            self.depths[id(target)] = self.depths[id(pkg)] + 1
+                            queue.append(target)
+        return self.depths
+
+    def why(self, pkg):
+        '''
+        Yields every chain of packages from pkg up to the requirements (or to a
+        package nothing depends on), shortest first. Cycles are skipped
+        '''
+        depths = self.root_depths()
+        counter = 0
+        heap = [(depths.get(id(pkg), 0), counter, (pkg,))]
+        while heap:
+            _, _, path = heapq.heappop(heap)
+            head = path[-1]
+            if self.is_root(head):
+                if len(path) > 1:
+                    yield list(path)
+                continue
+            for dep in head.incoming + head.incoming_mismatched:
+                parent = dep.parent
+                if id(parent) not in depths or any(x is parent for x in path):
+                    continue
+                counter += 1
+                heapq.heappush(heap, (len(path) + depths[id(parent)], counter, path + (parent,)))
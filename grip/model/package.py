@@ -1,26 +1,49 @@
+import functools
+import sys
+
 from pip._vendor.packaging.version import Version
 import pkg_resources
 
 
 class Package:
+    __slots__ = ('name', 'version', 'metadata', '_deps', 'deps_loader', 'incoming', 'incoming_mismatched')
+
     def __init__(self, name, version, metadata=None, deps=None):
         self.name = Package.sanitize_name(name)
         self.metadata = metadata
         if type(version) == str:
-            self.version = Version(version)
+            self.version = Package.parse_version(version)
         else:
             self.version = version
-        self.deps = deps or []
+        self._deps = deps
+        self.deps_loader = None
         self.incoming = []
         self.incoming_mismatched = []
 
+    @property
+    def deps(self):
+        if self._deps is None:
+            self._deps = self.deps_loader(self) if self.deps_loader else []
+        return self._deps
+
+    @deps.setter
+    def deps(self, deps):
+        self._deps = deps
+
     @staticmethod
     def from_distribution(dist):
         return Package(dist.project_name, dist.version, metadata=dist)
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def sanitize_name(name):
-        return pkg_resources.safe_name(name).lower()
+        return sys.intern(pkg_resources.safe_name(name).lower())
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def parse_version(version):
+        # versions are immutable, so equal ones can be shared between packages
+        return Version(version)
 
     def __str__(self):
         return f'{self.name}@{self.version}'
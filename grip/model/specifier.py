@@ -0,0 +1,151 @@
+import bisect
+from collections import namedtuple
+
+from pip._vendor.packaging.version import Version
+
+from .package import Package
+
+
+# low/high bound the versions a clause accepts. Versions of the same release
+# as `base` are subject to the PEP 440 special cases (pre-releases for <, post
+# and local releases for >, zero padding for == and wildcards) and are left to
+# the original specifier. `exclude` flips the interval (for != wildcards), and
+# `fallback` clauses (===, legacy ones and ~= pre-releases) always go to the
+# original specifier
+Clause = namedtuple('Clause', ['spec', 'low', 'low_inclusive', 'high', 'high_inclusive', 'base', 'exclude', 'fallback'])
+
+
+class CompiledSpecifier:
+    '''
+    A SpecifierSet compiled into a set of version intervals. Results are
+    memoized per version, and mask() tests a whole sorted list of versions
+    with a few binary searches
+    '''
+    __slots__ = ('specifier', 'clauses', 'prereleases', 'arbitrary', 'cache')
+
+    def __init__(self, specifier):
+        self.specifier = specifier
+        self.clauses = [CompiledSpecifier.compile(x) for x in specifier]
+        self.prereleases = bool(specifier.prereleases)
+        # === compares strings, so equal versions spelled differently can't share a result
+        self.arbitrary = any(x.spec.operator == '===' for x in self.clauses)
+        self.cache = {}
+
+    @staticmethod
+    def compile(spec):
+        operator, version = spec.operator, spec.version
+        if operator == '===' or type(spec).__name__ == 'LegacySpecifier':
+            return Clause(spec, None, False, None, False, None, False, True)
+
+        if version.endswith('.*'):
+            prefix = Package.parse_version(version[:-2])
+            if operator != '==' and operator != '!=' or not is_plain_release(prefix):
+                return Clause(spec, None, False, None, False, None, False, True)
+            # zero padding makes the versions of the prefix release itself a special case, too
+            low, high = release_range(prefix)
+            return Clause(spec, low, True, high, False, prefix, operator == '!=', False)
+
+        version = Package.parse_version(version)
+        base = Package.parse_version(version.base_version)
+        if operator == '~=' and version.is_prerelease:
+            # older packaging versions (like the one in pip 9) keep the pre-release in the prefix
+            return Clause(spec, None, False, None, False, None, False, True)
+        if operator == '~=':
+            # >=V combined with ==P.* where P is the release of V without its last part
+            _, high = release_range(version, drop=1)
+            return Clause(spec, version, True, high, False, base, False, False)
+        if operator == '>=':
+            return Clause(spec, version, True, None, False, base, False, False)
+        if operator == '>':
+            return Clause(spec, version, False, None, False, base, False, False)
+        if operator == '<=':
+            return Clause(spec, None, False, version, True, base, False, False)
+        if operator == '<':
+            return Clause(spec, None, False, version, False, base, False, False)
+        if operator == '==':
+            return Clause(spec, version, True, version, True, base, False, False)
+        if operator == '!=':
+            # everything outside of the release matches, the release itself is up to the specifier
+            return Clause(spec, None, False, None, False, base, False, False)
+        return Clause(spec, None, False, None, False, None, False, True)
+
+    def contains(self, version, prereleases=None):
+        if prereleases is None:
+            prereleases = self.prereleases
+        version = coerce(version)
+        if not prereleases and version.is_prerelease:
+            return False
+        key = str(version) if self.arbitrary else version
+        result = self.cache.get(key)
+        if result is None:
+            result = self.cache[key] = all(self.test(x, version) for x in self.clauses)
+        return result
+
+    def test(self, clause, version):
+        if clause.fallback or clause.base is not None and base_of(version) == clause.base:
+            return clause.spec.contains(str(version), prereleases=True)
+        if clause.low is not None:
+            if version < clause.low or version == clause.low and not clause.low_inclusive:
+                return clause.exclude
+        if clause.high is not None:
+            if version > clause.high or version == clause.high and not clause.high_inclusive:
+                return clause.exclude
+        return not clause.exclude
+
+    def mask(self, versions):
+        '''
+        Tests a list of versions sorted in ascending order at once, ignoring the
+        pre-release policy, and returns a list of booleans
+        '''
+        versions = [coerce(x) for x in versions]
+        result = [True] * len(versions)
+        for clause in self.clauses:
+            if clause.fallback:
+                result = [x and clause.spec.contains(str(y), prereleases=True) for x, y in zip(result, versions)]
+                continue
+
+            start, end = 0, len(versions)
+            if clause.low is not None:
+                start = (bisect.bisect_left if clause.low_inclusive else bisect.bisect_right)(versions, clause.low)
+            if clause.high is not None:
+                end = max(start, (bisect.bisect_right if clause.high_inclusive else bisect.bisect_left)(versions, clause.high))
+            inside = [not clause.exclude] * (end - start)
+            passed = [clause.exclude] * start + inside + [clause.exclude] * (len(versions) - end)
+
+            if clause.base is not None:
+                # the versions a clause has special cases for are a contiguous run of the list
+                index = bisect.bisect_left(versions, release_range(clause.base)[0])
+                while index < len(versions) and base_of(versions[index]) == clause.base:
+                    passed[index] = self.test(clause, versions[index])
+                    index += 1
+            result = [x and y for x, y in zip(result, passed)]
+        return result
+
+    def __str__(self):
+        return str(self.specifier)
+
+
+def coerce(version):
+    if isinstance(version, Version):
+        return version
+    return Package.parse_version(str(version))
+
+
+def base_of(version):
+    return Package.parse_version(version.base_version)
+
+
+def is_plain_release(version):
+    return not (version.is_prerelease or version.is_postrelease or version.local)
+
+
+def release_range(version, drop=0):
+    # [X.dev0, Y.dev0) holds exactly the versions starting with release X, with Y following X.
+    # The packaging version vendored by pip 9 has no public epoch and release attributes yet
+    epoch, release = version._version.epoch, version._version.release
+    release = release[:len(release) - drop]
+    prefix = '%s!' % epoch if epoch else ''
+    low = Package.parse_version(prefix + '.'.join(str(x) for x in release) + '.dev0')
+    following = release[:-1] + (release[-1] + 1,) if release else (0,)
+    high = Package.parse_version(prefix + '.'.join(str(x) for x in following) + '.dev0')
+    return low, high
@@ -46,3 +46,17 @@ class TestDependency(unittest.TestCase):
         dep = Dependency('django==2')
         dep.url = 'git+git@github.com:a/b.git'
         self.assertEqual(str(dep), dep.url + '#egg=django==2')
+
+    def test_lazy(self):
+        dep = Dependency('Django_Module[extra]>=2; python_version > "2"')
+        self.assertEqual(dep.name, 'django-module')
+        self.assertIsNone(dep._req)
+        self.assertEqual(dep.req.extras, {'extra'})
+
+    def test_shared(self):
+        a = Dependency('django>=2')
+        b = Dependency('Django>=2')
+        self.assertIs(a.specifier, b.specifier)
+        self.assertIs(a.name, b.name)
+        with self.assertRaises(AttributeError):
+            a.foo = 1
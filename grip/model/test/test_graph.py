@@ -1,7 +1,9 @@
 import os
 import tempfile
 import unittest
+from unittest.mock import patch
 from grip.model import PackageGraph, Package, Dependency
+from grip.model.cache import MetadataCache
 
 
 class TestPackageGraph(unittest.TestCase):
@@ -32,6 +34,35 @@ class TestPackageGraph(unittest.TestCase):
         self.assertEqual(g.find('celery'), g[0])
         self.assertEqual(g.find('django'), g[1])
 
+    def test_index_mutation(self):
+        g = self.mkgraph()
+        g.append(Package('six', '1.11'))
+        self.assertEqual(g.find('six'), g[3])
+        g.remove(g.find('django'))
+        self.assertEqual(g.find('django'), None)
+        self.assertEqual(g.match(Dependency('django<3')), None)
+        g.insert(0, Package('Django', '1.11'))
+        self.assertEqual(g.find('django'), g[0])
+        del g[0]
+        self.assertEqual(g.find('django'), None)
+        g.sort()
+        self.assertEqual([x.name for x in g], ['celery', 'pytz', 'six'])
+        self.assertEqual(g.find('pytz'), g[1])
+
+    def test_why(self):
+        pkgs = {x: Package(x, '1') for x in 'abcde'}
+        for a, b in ['ab', 'bc', 'ad', 'dc', 'ce', 'ec']:
+            pkgs[a].deps.append(Dependency(b, parent=pkgs[a]))
+        g = PackageGraph(items=sorted(pkgs.values()), requirements=[Dependency('a'), Dependency('d')])
+        g.resolve_dependencies()
+        paths = [[x.name for x in path] for path in g.why(g.find('e'))]
+        self.assertEqual(paths[0], ['e', 'c', 'd', '-project-'])
+        self.assertEqual(sorted(paths[1:]), [
+            ['e', 'c', 'b', 'a', '-project-'],
+            ['e', 'c', 'd', 'a', '-project-'],
+        ])
+        self.assertEqual(list(g.why(g.find('a'))), [[g.find('a'), g.requirements]])
+
     def test_resolution(self):
         g = self.mkgraph()
         g.resolve_dependencies()
@@ -42,6 +73,38 @@ class TestPackageGraph(unittest.TestCase):
         self.assertEqual(g.find('celery').deps[0].resolved_to, g.find('django'))
         self.assertEqual(g.find('django').deps[0].resolved_to, None)
 
+    def test_resolution_repeated(self):
+        g = self.mkgraph()
+        g.resolve_dependencies()
+        g.resolve_dependencies()
+        self.assertEqual(len(g.find('django').incoming), 2)
+        self.assertEqual(len(g.find('pytz').incoming_mismatched), 1)
+
+    def test_patch(self):
+        g = self.mkgraph()
+        g.resolve_dependencies()
+        old_django = g.find('django')
+        new_django = Package('django', '3.0', deps=[Dependency('pytz>=2016')])
+        new_django.deps[0].parent = new_django
+        g.patch(added=[new_django], removed=[old_django])
+        self.assertEqual([x.name for x in g], ['celery', 'django', 'pytz'])
+        self.assertIs(g.find('django'), new_django)
+        self.assertEqual(g.find('django').incoming, [g.find('celery').deps[0], g.requirements.deps[0]])
+        self.assertEqual(g.find('pytz').incoming, [new_django.deps[0]])
+        self.assertEqual(g.find('pytz').incoming_mismatched, [])
+
+        g.patch(removed=[g.find('pytz')])
+        self.assertEqual(g.find('pytz'), None)
+        self.assertEqual(new_django.deps[0].resolved_to, None)
+
+        g.patch(added=[Package('pytz', '2018')])
+        self.assertEqual(new_django.deps[0].resolved_to, g.find('pytz'))
+
+        g.patch(requirements=[Dependency('pytz>2018')])
+        self.assertEqual(g.find('django').incoming, [g.find('celery').deps[0]])
+        self.assertEqual(g.find('pytz').incoming, [new_django.deps[0]])
+        self.assertEqual(g.find('pytz').incoming_mismatched, [g.requirements.deps[0]])
+
     def test_from_directory(self):
         with tempfile.TemporaryDirectory() as tmp:
             os.mkdir(tmp + '/a-1.dist-info')
@@ -64,3 +127,32 @@ class TestPackageGraph(unittest.TestCase):
             self.assertEqual(str(g[1].version), '2')
             self.assertEqual(g[0].deps[0].name, 'b')
             self.assertTrue(g[0].deps[0].matches_version('2'))
+
+    def test_from_directory_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.mkdir(tmp + '/a-1.dist-info')
+            with open(tmp + '/a-1.dist-info/METADATA', 'w') as f:
+                f.write('Metadata-Version: 2.0\n')
+                f.write('Name: a\n')
+                f.write('Version: 1\n')
+                f.write('Requires-Dist: b (>=2)\n')
+
+            g = PackageGraph.from_directory(tmp)
+            self.assertTrue(os.path.exists(os.path.join(tmp, MetadataCache.FILENAME)))
+            self.assertIsNone(MetadataCache(tmp).entries['a-1.dist-info']['requires'])
+            g.resolve_dependencies()
+            self.assertEqual(MetadataCache(tmp).entries['a-1.dist-info']['requires'], ['b>=2'])
+
+            with patch('pkg_resources.distributions_from_metadata', side_effect=AssertionError):
+                g = PackageGraph.from_directory(tmp)
+            self.assertEqual(g[0].name, 'a')
+            self.assertEqual(str(g[0].version), '1')
+            self.assertEqual(str(g[0].deps[0]), 'b>=2')
+            self.assertEqual(g[0].deps[0].parent, g[0])
+            self.assertEqual(g[0].metadata.get_metadata('METADATA').splitlines()[1], 'Name: a')
+
+            os.utime(tmp + '/a-1.dist-info', ns=(0, 0))
+            with patch('pkg_resources.distributions_from_metadata', return_value=[]) as m:
+                g = PackageGraph.from_directory(tmp)
+                m.assert_called_once()
+            self.assertEqual(len(g), 0)
@@ -24,3 +24,12 @@ class TestPackage(unittest.TestCase):
     def test_str(self):
         pkg = Package('Django', '1.0')
         self.assertEqual(str(pkg), 'django@1.0')
+
+    def test_lazy_deps(self):
+        calls = []
+        pkg = Package('a', '1.0')
+        pkg.deps_loader = lambda pkg: calls.append(pkg) or ['b']
+        self.assertEqual(calls, [])
+        self.assertEqual(pkg.deps, ['b'])
+        self.assertEqual(pkg.deps, ['b'])
+        self.assertEqual(calls, [pkg])
@@ -0,0 +1,37 @@
+import unittest
+from pip._vendor.packaging.specifiers import SpecifierSet
+from grip.model import Version
+from grip.model.specifier import CompiledSpecifier
+
+
+VERSIONS = sorted(Version(x) for x in [
+    '0.9', '1', '1.0.dev0', '1.0a1', '1.0', '1.0+local', '1.0.post1', '1.0.1',
+    '1.4', '1.4.5rc1', '1.4.5', '1.4.5.post2', '1.4.9', '1.5.dev0', '2.0', '1!1.0',
+])
+SPECIFIERS = [
+    '', '>=1.0', '>1.0', '<=1.0', '<1.0', '==1.0', '==1', '!=1.0', '==1.0+local',
+    '==1.4.*', '!=1.4.*', '==1.0.*', '~=1.4.5', '~=1.4', '~=1.0a1', '>=1.0a1,<1.5', '>0.9,!=1.0.*,<2', '===1.0',
+]
+
+
+class TestCompiledSpecifier(unittest.TestCase):
+    def test_contains(self):
+        for spec in SPECIFIERS:
+            specifier = SpecifierSet(spec)
+            compiled = CompiledSpecifier(specifier)
+            for version in VERSIONS:
+                for prereleases in (None, False, True):
+                    self.assertEqual(
+                        compiled.contains(version, prereleases=prereleases),
+                        specifier.contains(version, prereleases=prereleases),
+                        (spec, version, prereleases),
+                    )
+
+    def test_mask(self):
+        for spec in SPECIFIERS:
+            specifier = SpecifierSet(spec)
+            self.assertEqual(
+                CompiledSpecifier(specifier).mask(VERSIONS),
+                [specifier.contains(x, prereleases=True) for x in VERSIONS],
+                spec,
+            )
@@ -1,6 +1,7 @@
 from collections import namedtuple
 import grip.ui as ui
-from .model import PackageGraph, Package, Dependency
+from .model import PackageGraph
+from .resolver import Resolver, ResolutionError
 
 InstallAction = namedtuple('InstallAction', ['dependency'])
 SaveAction = namedtuple('SaveAction', ['spec'])
@@ -9,21 +10,60 @@ FailAction = namedtuple('FailAction', [])
 
 
 class Planner:
-    def __init__(self, graph, index=None, quiet=False):
+    def __init__(self, graph, index=None, quiet=False, metadata=None):
         self.graph = graph
         self.index = index
         self.quiet = quiet
+        self.metadata = metadata
+        self.rounds = 0
 
     def prune(self):
-        for_removal = []
-        for pkg in self.graph:
-            if pkg.name in PackageGraph.SYSTEM_PKGS:
+        '''
+        Removes every package that is not needed by the requirements or the
+        system packages, dependents before their dependencies. Runs in
+        linear time over the indexed graph
+        '''
+        # everything reachable from the requirements and the system packages stays
+        keep = set()
+        stack = [
+            pkg for name in PackageGraph.SYSTEM_PKGS for pkg in self.graph.by_name.get(name, ())
+        ] + [
+            pkg for dep in self.graph.requirements.deps for pkg in self.graph.by_name.get(dep.name, ())
+        ]
+        while stack:
+            pkg = stack.pop()
+            if id(pkg) in keep:
                 continue
+            keep.add(id(pkg))
+            for dep in pkg.deps:
+                stack.extend(self.graph.by_name.get(dep.name, ()))
+
+        orphans = [x for x in self.graph if id(x) not in keep]
 
-            if all(x in for_removal for x in (pkg.incoming + pkg.incoming_mismatched)):
-                for_removal.append(pkg)
+        # reverse post-order puts dependents before their dependencies, cycles included
+        def dependencies(pkg):
+            for dep in pkg.deps:
+                yield from self.graph.by_name.get(dep.name, ())
 
-        yield from (RemoveAction(pkg) for pkg in for_removal)
+        order = []
+        visited = set(keep)
+        for root in orphans:
+            if id(root) in visited:
+                continue
+            visited.add(id(root))
+            stack = [(root, dependencies(root))]
+            while stack:
+                pkg, targets = stack[-1]
+                for target in targets:
+                    if id(target) not in visited:
+                        visited.add(id(target))
+                        stack.append((target, dependencies(target)))
+                        break
+                else:
+                    stack.pop()
+                    order.append(pkg)
+
+        yield from (RemoveAction(pkg) for pkg in reversed(order))
 
     def remove(self, packages):
         for name in packages:
@@ -33,56 +73,69 @@ class Planner:
             elif not self.quiet:
                 ui.error(ui.bold(name), 'is not installed')
 
-    def install(self, dep, upgrade=False, downgrade=False, save=False):
-        installed_pkg = self.graph.find(dep.name)
-        if installed_pkg and dep.matches_version(installed_pkg.version) and not upgrade:
-            if not self.quiet:
-                ui.info(ui.dep(dep), 'is already installed as', ui.pkg(installed_pkg))
-            if save:
-                resolved_dep = Dependency.exact(installed_pkg)
-                yield SaveAction(resolved_dep)
-            return
+    def sync(self, locked):
+        '''
+        Brings the installed packages in line with a lockfile, touching only
+        the packages that differ. The locked artifacts are used as they are
+        '''
+        locked_names = set(x.name for x in locked)
+        for pkg in self.graph:
+            if pkg.name not in PackageGraph.SYSTEM_PKGS and pkg.name not in locked_names:
+                yield RemoveAction(pkg)
 
-        if dep.url:
-            resolved_dep = dep
-        else:
-            candidates = self.index.candidates_for(dep)
-            best_candidate = self.index.best_candidate_of(dep, candidates)
-            if not best_candidate:
-                if not self.quiet:
-                    ui.error('No packages available for', ui.dep(dep))
-                latest = self.index.best_candidate_of(None, candidates)
+        for dep in locked:
+            installed_pkg = self.graph.find(dep.name)
+            if installed_pkg and dep.matches_version(installed_pkg.version):
+                continue
+            if not dep.potential_candidate:
                 if not self.quiet:
-                    if latest:
-                        ui.error('latest:', latest.version)
-                    ui.error(f'all: https://pypi.org/project/{dep.name}/#history')
+                    ui.error('No artifact locked for', ui.dep(dep))
                 yield FailAction()
+                return
+            if installed_pkg:
+                yield RemoveAction(installed_pkg)
+            yield InstallAction(dep)
 
-            resolved_dep = Dependency.exact(Package(dep.name, best_candidate.version))
-
-        if not dep.url and installed_pkg and not dep.matches_version(installed_pkg.version):
+    def resolve(self, deps, upgrade=False, save=False):
+        '''
+        Computes the complete set of packages for the given dependencies
+        before anything is touched and yields a single plan, ordered so that
+        dependencies are installed before their dependents
+        '''
+        resolver = Resolver(self.graph, self.index, self.metadata, upgrade=upgrade)
+        try:
+            resolver.resolve(deps)
+        except ResolutionError as e:
             if not self.quiet:
-                ui.warn('Dependency mismatch')
-                print(' -', ui.pkg(installed_pkg), '(installed)')
-                if len(installed_pkg.incoming):
-                    print('   └ required by', ui.pkg(installed_pkg.incoming[0].parent, version=False))
-                print(' -', ui.dep(dep), '(requested)')
-                print('   └ required by', ui.pkg(dep.parent, version=False))
+                if e.gave_up:
+                    ui.error('Gave up resolving after', Resolver.MAX_ROUNDS, 'attempts')
+                ui.error('Could not find a version of', ui.bold(e.name), 'that satisfies:')
+                for dep in e.deps:
+                    print(' -', ui.dep(dep), 'required by', ui.pkg(dep.parent, version=False))
+                if getattr(self.index, 'offline', False):
+                    ui.error('Only cached wheels are available in offline mode')
+            yield FailAction()
+            return
+        finally:
+            self.rounds = resolver.rounds
 
-            if installed_pkg.version < best_candidate.version:
-                if not self.quiet:
-                    ui.warn('Will upgrade')
-            elif not downgrade:
-                if not self.quiet:
-                    ui.warn('Will not downgrade')
-                return
-            else:
+        for name in resolver.install_order(deps):
+            choice, pkg = resolver.pins[name]
+            installed_pkg = self.graph.find(name)
+            if choice.resolved_to or (installed_pkg and not choice.url and installed_pkg.version == pkg.version):
+                continue
+            if installed_pkg:
                 if not self.quiet:
-                    ui.warn('Will downgrade')
+                    ui.warn(
+                        'Will upgrade' if not pkg.version or installed_pkg.version < pkg.version else 'Will downgrade',
+                        ui.pkg(installed_pkg), '→', ui.dep(choice),
+                    )
+                yield RemoveAction(installed_pkg)
+            yield InstallAction(choice)
 
-        if installed_pkg:
-            yield RemoveAction(installed_pkg)
-
-        yield InstallAction(resolved_dep)
-        if save:
-            yield SaveAction(resolved_dep)
+        for dep in deps:
+            choice, pkg = resolver.pins[dep.name]
+            if choice.resolved_to and not self.quiet:
+                ui.info(ui.dep(dep), 'is already installed as', ui.pkg(choice.resolved_to))
+            if save:
+                yield SaveAction(choice)
@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+
+
+class Remover:
+    '''
+    Moves package files into a trash directory instead of deleting them right
+    away, so that the removal can be undone if the following install fails.
+    Rolling back also takes out the packages that install managed to put in.
+    A process that dies in between leaves its trash directory behind, which
+    the next Remover on the same site-packages deletes
+    '''
+    TRASH_PREFIX = '.grip-trash-'
+
+    def __init__(self, site_packages):
+        self.site_packages = os.path.abspath(site_packages)
+        self.trash = None
+        self.moved = []
+        self.removed_dirs = []
+        self.dist_infos = None
+        self.dirs = set()
+
+    def __enter__(self):
+        self.remove_stale_trash()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type:
+            self.rollback()
+        else:
+            self.commit()
+
+    def remove_stale_trash(self):
+        try:
+            names = os.listdir(self.site_packages)
+        except OSError:
+            return
+        for name in names:
+            if not name.startswith(Remover.TRASH_PREFIX):
+                continue
+            pid = name[len(Remover.TRASH_PREFIX):].split('-')[0]
+            # a concurrent grip may still need its trash for a rollback
+            if pid.isdigit() and is_running(int(pid)):
+                continue
+            shutil.rmtree(os.path.join(self.site_packages, name), ignore_errors=True)
+
+    def remove(self, package):
+        if not self.trash:
+            self.trash = tempfile.mkdtemp(prefix='%s%i-' % (Remover.TRASH_PREFIX, os.getpid()), dir=self.site_packages)
+
+        by_dir = {}
+        for line in package.metadata.get_metadata('RECORD').splitlines():
+            path = os.path.normpath(os.path.join(self.site_packages, line.split(',')[0]))
+            dir, name = os.path.split(path)
+            by_dir.setdefault(dir, []).append(name)
+
+        for dir, names in by_dir.items():
+            for name in names:
+                path = os.path.join(dir, name)
+                staged = os.path.join(self.trash, str(len(self.moved)))
+                try:
+                    os.rename(path, staged)
+                except FileNotFoundError:
+                    continue
+                except OSError:
+                    # different filesystem, e.g. scripts outside of the virtualenv
+                    shutil.move(path, staged)
+                self.moved.append((path, staged))
+            self.dirs.add(dir)
+
+    def prune(self):
+        # every directory is visited once, children before their parents
+        dirs = set()
+        for dir in self.dirs:
+            while dir.startswith(self.site_packages + os.sep) and dir not in dirs:
+                dirs.add(dir)
+                dir = os.path.dirname(dir)
+
+        for dir in sorted(dirs, key=lambda x: x.count(os.sep), reverse=True):
+            try:
+                os.rmdir(dir)
+            except OSError:
+                continue
+            self.removed_dirs.append(dir)
+        self.dirs = set()
+
+    def track_installs(self, dist_infos):
+        '''
+        Marks the start of the install. Any dist-info directory not in
+        `dist_infos` is treated as new and removed again on rollback
+        '''
+        self.dist_infos = set(dist_infos)
+
+    def discard_installs(self):
+        for name in os.listdir(self.site_packages):
+            if not name.endswith('.dist-info') or name in self.dist_infos:
+                continue
+            dist_info = os.path.join(self.site_packages, name)
+            try:
+                with open(os.path.join(dist_info, 'RECORD')) as f:
+                    lines = f.read().splitlines()
+            except OSError:
+                lines = []
+            for line in lines:
+                path = os.path.normpath(os.path.join(self.site_packages, line.split(',')[0]))
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self.dirs.add(os.path.dirname(path))
+            shutil.rmtree(dist_info, ignore_errors=True)
+
+    def commit(self):
+        if self.trash:
+            shutil.rmtree(self.trash, ignore_errors=True)
+        self.trash = None
+        self.moved = []
+        self.removed_dirs = []
+        self.dist_infos = None
+
+    def rollback(self):
+        removed_dirs, self.removed_dirs = self.removed_dirs, []
+        if self.dist_infos is not None:
+            self.discard_installs()
+            self.prune()
+            self.dist_infos = None
+        for dir in reversed(removed_dirs):
+            os.makedirs(dir, exist_ok=True)
+        for path, staged in reversed(self.moved):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(staged, path)
+        self.moved = []
+        self.removed_dirs = []
+        self.commit()
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -1,3 +1,6 @@
+from contextlib import contextmanager
+
+
 class Requirements:
     def read(self):
         pass
@@ -7,3 +10,7 @@ class Requirements:
 
     def remove(self, package):
         pass
+
+    @contextmanager
+    def batch(self):
+        yield self
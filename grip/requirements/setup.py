@@ -1,31 +1,212 @@
-from importlib import util
+import ast
+import collections
+import configparser
+import hashlib
+import json
 import os
-import setuptools
+import subprocess
 import sys
 
 from .base import Requirements
-# expand_env_variables
-from ..model import Dependency
+from ..jsoncache import JsonCache, cache_path
+import grip.ui as ui
+
+
+KEYWORDS = ('install_requires', 'tests_require')
+
+# runs setup.py in a separate interpreter and prints the keywords it passed to setup()
+RUNNER = '''
+import json, runpy, sys
+import setuptools
+keywords = %r
+result = {}
+def setup(**kwargs):
+    result.update((k, v if isinstance(v, str) else list(v)) for k, v in kwargs.items() if k in keywords)
+setuptools.setup = setup
+try:
+    import distutils.core
+    distutils.core.setup = setup
+except ImportError:
+    pass
+sys.argv = ['setup.py']
+sys.path.insert(0, '.')
+runpy.run_path('setup.py', run_name='__main__')
+sys.stdout.write('\\n' + json.dumps(result) + '\\n')
+''' % (KEYWORDS,)
+
+
+class SetupCache(JsonCache):
+    '''
+    Remembers the dependencies read from every project, for as long as the
+    hash of its setup.py and setup.cfg stays the same
+    '''
+
+    def __init__(self, path=None):
+        super().__init__(path or cache_path('setup-requires.json'))
+
+    def get(self, dir, digest):
+        entry = self.get_entry(dir)
+        if entry and entry['hash'] == digest:
+            return entry['requires']
+
+    def put(self, dir, digest, requires):
+        self.put_entry(dir, {'hash': digest, 'requires': requires})
 
 
 class SetupPyRequirements(Requirements):
-    def __init__(self, path):
+    '''
+    Dependencies of a setuptools project, taken from setup.cfg and setup.py.
+    setup.py is only executed (in a subprocess) when its setup() call can't be
+    read statically, and what it returns is not cached, since it may depend on
+    more than the hashed files
+    '''
+    FILES = ('setup.py', 'setup.cfg')
+
+    def __init__(self, path, cache=None):
         self.path = path
+        self.dir = os.path.dirname(os.path.abspath(path))
+        self.cache = cache or SetupCache()
 
     def read(self):
-        deps = []
-        def fake_setup(install_requires=[], tests_require=[], **kwargs):
-            for x in install_requires + tests_require:
-                deps.append(Dependency(x))
+        from ..model import Dependency
+
+        digest = self.digest()
+        requires = self.cache.get(self.dir, digest)
+        if requires is None:
+            requires, static = self.extract()
+            if static:
+                self.cache.put(self.dir, digest, requires)
+                self.cache.save()
+        return [Dependency(x) for x in requires]
 
-        setuptools.setup = fake_setup
+    def digest(self):
+        hash = hashlib.sha256()
+        for name in SetupPyRequirements.FILES:
+            try:
+                with open(os.path.join(self.dir, name), 'rb') as f:
+                    content = f.read()
+            except OSError:
+                continue
+            hash.update(name.encode() + b'\0' + content + b'\0')
+        return hash.hexdigest()
 
-        sys.path.insert(0, os.path.dirname(self.path))
-        spec = util.spec_from_file_location('__setup', self.path)
-        mod = util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
-        sys.path.pop(0)
-        return deps
+    def extract(self):
+        '''
+        Returns the dependencies, and whether they were read without running
+        setup.py
+        '''
+        requires = self.read_setup_cfg()
+        static = True
+        setup_py = os.path.join(self.dir, 'setup.py')
+        if os.path.isfile(setup_py):
+            try:
+                keywords = SetupPyRequirements.parse_setup_py(setup_py)
+            except (ValueError, SyntaxError):
+                keywords = self.run_setup_py()
+                static = False
+            # setup() arguments take precedence over setup.cfg
+            if any(x in keywords for x in KEYWORDS):
+                requires = [y for x in KEYWORDS for y in split_requires(keywords.get(x, []))]
+        return requires or [], static
+
+    def read_setup_cfg(self):
+        path = os.path.join(self.dir, 'setup.cfg')
+        if not os.path.isfile(path):
+            return None
+        config = configparser.ConfigParser(interpolation=None)
+        config.read(path)
+        if not config.has_section('options'):
+            return None
+        keywords = {x: config.get('options', x) for x in KEYWORDS if config.has_option('options', x)}
+        if not keywords:
+            return None
+        return [y for x in KEYWORDS for y in split_requires(keywords.get(x, ''))]
+
+    @staticmethod
+    def parse_setup_py(path):
+        '''
+        Returns the literal dependency arguments of the setup() call, or
+        raises ValueError if they can't be determined without running it
+        '''
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), path)
+
+        assigned = {}
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                assigned[node.targets[0].id] = node.value
+
+        # only names bound exactly once, by a plain module level assignment, can be resolved statically.
+        # Anything rebound in a branch, loop or function, or modified in place, needs setup.py to run
+        bindings = collections.Counter()
+        ambiguous = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                bindings[node.id] += 1
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                ambiguous.update(node.names)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                bindings.update((x.asname or x.name).split('.')[0] for x in node.names)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                bindings[node.name] += 1
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                bindings[node.name] += 1
+            elif isinstance(node, (ast.Attribute, ast.Subscript)) and isinstance(node.value, ast.Name):
+                # e.g. requires.append(...) or requires[0] = ...
+                ambiguous.add(node.value.id)
+        names = {
+            name: value for name, value in assigned.items()
+            if bindings[name] == 1 and name not in ambiguous
+        }
+
+        calls = [
+            x for x in ast.walk(tree)
+            if isinstance(x, ast.Call) and getattr(x.func, 'id', getattr(x.func, 'attr', None)) == 'setup'
+        ]
+        if len(calls) != 1:
+            raise ValueError('expected a single setup() call')
+        if calls[0].args or any(x.arg is None for x in calls[0].keywords):
+            raise ValueError('setup() arguments are not all keywords')
+
+        return {
+            x.arg: evaluate(x.value, names)
+            for x in calls[0].keywords if x.arg in KEYWORDS
+        }
+
+    def run_setup_py(self):
+        try:
+            output = subprocess.check_output(
+                [sys.executable, '-c', RUNNER], cwd=self.dir, stderr=subprocess.PIPE,
+            )
+            return json.loads(output.decode().splitlines()[-1])
+        except subprocess.CalledProcessError as e:
+            ui.error('Could not run setup.py:', e.stderr.decode().strip())
+            sys.exit(1)
+        except (IndexError, ValueError):
+            ui.error('Could not read the setup() arguments from setup.py')
+            sys.exit(1)
 
     def __str__(self):
-        return '<setup.py>'
+        return '<%s>' % os.path.basename(self.path)
+
+
+def evaluate(node, names, seen=()):
+    if isinstance(node, ast.Name):
+        if node.id in seen or names.get(node.id) is None:
+            raise ValueError('%s can not be resolved' % node.id)
+        return evaluate(names[node.id], names, seen + (node.id,))
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return evaluate(node.left, names, seen) + evaluate(node.right, names, seen)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [y for x in node.elts for y in split_requires(evaluate(x, names, seen))]
+    value = ast.literal_eval(node)
+    if not isinstance(value, (str, list, tuple)):
+        raise ValueError('unexpected %s' % type(value).__name__)
+    return value
+
+
+def split_requires(value):
+    # setuptools accepts a single string with one requirement per line, too
+    if isinstance(value, str):
+        value = value.splitlines()
+    return [x.strip() for x in value if x.strip() and not x.strip().startswith('#')]
@@ -1,54 +1,156 @@
 import os
+import re
+from collections import namedtuple
+from contextlib import contextmanager
 from .base import Requirements
-from pip.req.req_file import join_lines, ignore_comments, process_line
-from ..model import Dependency
 import grip.ui as ui
 
 
+# a logical line: its original text (including any continuations), plus
+# the dependency or the included file it stands for, if any
+Line = namedtuple('Line', ['text', 'dependency', 'include'])
+
+
 class TxtRequirements(Requirements):
-    def __init__(self, path):
-        self.path = path
+    CONTINUATION_REGEX = re.compile(r'\\\r?\n')
+    COMMENT_REGEX = re.compile(r'(^|\s+)#.*$')
+    OPTIONS_REGEX = re.compile(r'\s+--?[A-Za-z]')
+    INCLUDE_REGEX = re.compile(r'^(-r|--requirement)(\s*=\s*|\s+|(?=[^-\s]))(\S+)$')
+    EDITABLE_REGEX = re.compile(r'^(-e|--editable)(\s*=\s*|\s+)(\S+)$')
 
-    def read(self):
-        for req, line_number in self.__read_lines():
-            yield Dependency(req)
+    def __init__(self, path, parent=None):
+        self.path = path
+        self.parent = parent
+        self.lines = None
+        self.dirty = False
+        self.batches = 0
 
-    def __read_lines(self):
+    def load(self):
+        if self.lines is not None:
+            return
+        self.lines = []
         with open(self.path) as f:
-            lines = f.read().splitlines()
-            lines_enum = enumerate(lines, start=1)
-            lines_enum = join_lines(lines_enum)
-            lines_enum = ignore_comments(lines_enum)
-        for line_number, line in lines_enum:
-            if line.startswith('-e '):
-                ui.warn('requirements file flags are not supported yet:', line)
+            physical = f.read().splitlines(keepends=True)
+
+        text = ''
+        for line in physical:
+            text += line
+            if line.rstrip('\r\n').endswith('\\'):
                 continue
-            req_iter = process_line(
-                line, None, 0, None,
-                None, None, None, None,
-            )
-            for req in req_iter:
-                yield req, line_number
+            self.lines.append(self.parse_line(text))
+            text = ''
+        if text:
+            self.lines.append(self.parse_line(text))
+
+    def parse_line(self, text):
+        from ..model import Dependency
+
+        line = TxtRequirements.CONTINUATION_REGEX.sub('', text)
+        line = TxtRequirements.COMMENT_REGEX.sub('', line).strip()
+        if not line:
+            return Line(text, None, None)
+
+        match = TxtRequirements.INCLUDE_REGEX.match(line)
+        if match:
+            path = os.path.join(os.path.dirname(self.path), match.group(3))
+            if self.includes_path(path):
+                ui.warn('requirements file includes itself:', line)
+                return Line(text, None, None)
+            return Line(text, None, TxtRequirements(path, parent=self))
+
+        match = TxtRequirements.EDITABLE_REGEX.match(line)
+        if match:
+            line = match.group(3)
+        elif line.startswith('-'):
+            # index and install options do not affect the dependency list
+            return Line(text, None, None)
+
+        line = TxtRequirements.OPTIONS_REGEX.split(line, 1)[0]
+        if '#egg=' in line:
+            url, name = line.split('#egg=', 1)
+            dependency = Dependency(name)
+            dependency.url = url
+        elif match or '://' in line or line.startswith(('.', '/')):
+            ui.warn('requirements without a package name are not supported yet:', line)
+            return Line(text, None, None)
+        else:
+            dependency = Dependency(line)
+        return Line(text, dependency, None)
+
+    def includes_path(self, path):
+        path = os.path.realpath(path)
+        file = self
+        while file:
+            if os.path.realpath(file.path) == path:
+                return True
+            file = file.parent
+        return False
+
+    def files(self):
+        self.load()
+        yield self
+        for line in self.lines:
+            if line.include:
+                yield from line.include.files()
+
+    def read(self):
+        self.load()
+        for line in self.lines:
+            if line.dependency:
+                yield line.dependency
+            if line.include:
+                yield from line.include.read()
+
+    def find(self, name):
+        for file in self.files():
+            for index, line in enumerate(file.lines):
+                if line.dependency and line.dependency.name == name:
+                    return file, index
+        return None, None
 
     def add(self, dependency):
-        self.remove(dependency.name)
-        with open(self.path, 'r') as f:
-            content = f.read()
-        content = content.rstrip('\n') + '\n' + str(dependency) + '\n'
-        with open(self.path, 'w') as f:
-            f.write(content)
+        file, index = self.find(dependency.name)
+        if file:
+            file.lines[index] = Line(str(dependency) + '\n', dependency, None)
+        else:
+            file = self
+            if self.lines and not self.lines[-1].text.endswith('\n'):
+                self.lines[-1] = self.lines[-1]._replace(text=self.lines[-1].text + '\n')
+            self.lines.append(Line(str(dependency) + '\n', dependency, None))
+        file.dirty = True
+        self.save_unless_batching()
 
     def remove(self, name):
-        for req, line_number in self.__read_lines():
-            if req.name == name:
-                with open(self.path, 'r') as f:
-                    content = f.read()
-                lines = content.splitlines()
-                lines.pop(line_number - 1)
-                content = '\n'.join(lines) + '\n'
-                with open(self.path, 'w') as f:
-                    f.write(content)
-                return
+        file, index = self.find(name)
+        if file:
+            file.lines.pop(index)
+            file.dirty = True
+            self.save_unless_batching()
+
+    @contextmanager
+    def batch(self):
+        self.batches += 1
+        try:
+            yield self
+        finally:
+            self.batches -= 1
+            self.save_unless_batching()
+
+    def save_unless_batching(self):
+        if not self.batches:
+            self.save()
+
+    def save(self):
+        for file in self.files():
+            if file.dirty:
+                file.write()
+
+    def write(self):
+        tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            f.write(''.join(x.text for x in self.lines))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
 
     def __str__(self):
         return os.path.basename(self.path)
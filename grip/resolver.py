@@ -0,0 +1,212 @@
+from collections import OrderedDict
+
+from .model import Package, Dependency
+
+
+class ResolutionError(Exception):
+    def __init__(self, name, deps, gave_up=False):
+        Exception.__init__(self, name)
+        self.name = name
+        self.deps = deps
+        self.gave_up = gave_up
+
+
+class Frame:
+    def __init__(self, name, choices):
+        self.name = name
+        self.choices = iter(choices)
+        self.conflicts = set()
+
+
+class Resolver:
+    '''
+    Backtracking resolver with conflict-directed backjumping: when no version
+    of a package fits, it jumps straight back to the most recent package that
+    contributed to the conflict instead of retrying everything in between
+    '''
+    MAX_ROUNDS = 100000
+
+    def __init__(self, graph, index, metadata, upgrade=False):
+        self.graph = graph
+        self.index = index
+        self.metadata = metadata
+        self.upgrade = upgrade
+        self.rounds = 0
+        self.constraints = OrderedDict()
+        self.pins = OrderedDict()
+        self.requirements = {}
+        self.candidate_cache = {}
+        self.candidate_choices = {}
+        self.choice_cache = {}
+        self.requirement_cache = {}
+        self.prefetched = set()
+        self.nogoods = {}
+
+    def candidates(self, dep):
+        if dep.name not in self.candidate_cache:
+            self.candidate_cache[dep.name] = self.index.candidates_for(dep)
+        return self.candidate_cache[dep.name]
+
+    def choices(self, name, deps):
+        key = (name, frozenset(id(x) for x in deps))
+        if key not in self.choice_cache:
+            self.choice_cache[key] = self.find_choices(name, deps)
+        return self.choice_cache[key]
+
+    def find_choices(self, name, deps):
+        url_deps = [x for x in deps if x.url]
+        if len(url_deps):
+            return [url_deps[0]]
+
+        result = []
+        installed_pkg = self.graph.find(name)
+        if installed_pkg and not self.upgrade and all(x.matches_version(installed_pkg.version) for x in deps):
+            choice = Dependency.exact(installed_pkg)
+            choice.resolved_to = installed_pkg
+            result.append(choice)
+        else:
+            installed_pkg = None
+
+        extras = set()
+        for dep in deps:
+            extras.update(dep.req.extras)
+
+        for candidate in self.index.sorted_candidates_of(deps, self.candidates(deps[0])):
+            if installed_pkg and candidate.version == installed_pkg.version:
+                continue
+            key = (name, candidate.version, frozenset(extras))
+            if key not in self.candidate_choices:
+                choice = Dependency.exact(Package(name, candidate.version))
+                choice.req.extras = extras
+                choice.potential_candidate = candidate
+                self.candidate_choices[key] = choice
+            result.append(self.candidate_choices[key])
+        return result
+
+    def requirements_of(self, choice):
+        if choice not in self.requirement_cache:
+            if choice.resolved_to:
+                pkg = choice.resolved_to
+                reqs = [str(x.req) for x in pkg.deps]
+            else:
+                pkg = Package(choice.name, choice.potential_candidate.version if choice.potential_candidate else None)
+                reqs = self.metadata.requirements_for(choice)
+            self.requirement_cache[choice] = (pkg, [Dependency(x, parent=pkg) for x in reqs])
+        return self.requirement_cache[choice]
+
+    def prefetch(self, reqs):
+        reqs = [x for x in reqs if x.name not in self.pins and x.name not in self.prefetched]
+        for req in reqs:
+            self.prefetched.add(req.name)
+
+        if hasattr(self.index, 'candidates_for_many'):
+            missing = list({x.name: x for x in reqs if not x.url and x.name not in self.candidate_cache}.values())
+            for dep, candidates in zip(missing, self.index.candidates_for_many(missing)):
+                self.candidate_cache[dep.name] = candidates
+
+        if hasattr(self.metadata, 'prefetch'):
+            choices = []
+            for req in reqs:
+                best = (self.choices(req.name, [req]) or [None])[0]
+                if best and not best.resolved_to:
+                    choices.append(best)
+            self.metadata.prefetch(choices)
+
+    def conflicts(self, reqs):
+        result = set()
+        for req in reqs:
+            if req.name in self.pins and not req.url:
+                pinned_version = self.pins[req.name][1].version
+                if pinned_version and not req.matches_version(pinned_version):
+                    result.add(req.name)
+        return result
+
+    def pin(self, name, choice, pkg, reqs):
+        self.pins[name] = (choice, pkg)
+        self.requirements[name] = reqs
+        for req in reqs:
+            self.constraints.setdefault(req.name, []).append(req)
+
+    def unpin(self, name):
+        for req in self.requirements.pop(name):
+            self.constraints[req.name].remove(req)
+            if not self.constraints[req.name]:
+                del self.constraints[req.name]
+        del self.pins[name]
+
+    def resolve(self, deps):
+        for dep in deps:
+            self.constraints.setdefault(dep.name, []).append(dep)
+        self.prefetch(deps)
+
+        conflict = None
+        frames = []
+        while True:
+            pending = [x for x in self.constraints if x not in self.pins]
+            if not pending:
+                return self.pins
+
+            # most constrained package first, so that dead ends show up early
+            name = min(pending, key=lambda x: len(self.choices(x, self.constraints[x])))
+            frames.append(Frame(name, self.choices(name, self.constraints[name])))
+            while frames:
+                self.rounds += 1
+                if self.rounds > Resolver.MAX_ROUNDS:
+                    raise ResolutionError(frames[-1].name, list(self.constraints[frames[-1].name]), gave_up=True)
+
+                frame = frames[-1]
+                if frame.name in self.pins:
+                    self.unpin(frame.name)
+
+                key = (frame.name, frozenset(id(x) for x in self.constraints[frame.name]))
+                nogood = self.nogoods.get(key)
+                if nogood and all(self.pins.get(x, (None,))[0] is choice for x, choice in nogood.items()):
+                    frame.choices = iter(())
+                    frame.conflicts |= set(nogood)
+
+                for choice in frame.choices:
+                    pkg, reqs = self.requirements_of(choice)
+                    culprits = self.conflicts(reqs)
+                    if culprits:
+                        frame.conflicts |= culprits
+                        continue
+                    self.pin(frame.name, choice, pkg, reqs)
+                    self.prefetch(reqs)
+                    break
+                else:
+                    constraints = self.constraints[frame.name]
+                    if not conflict:
+                        conflict = (frame.name, list(constraints))
+                    culprits = frame.conflicts | set(x.parent.name for x in constraints if x.parent and x.parent.name in self.pins)
+                    # remember the dead end for as long as the same pins are in place
+                    self.nogoods[key] = {x: self.pins[x][0] for x in frame.conflicts if x in self.pins}
+                    frames.pop()
+                    while frames and frames[-1].name not in culprits:
+                        self.unpin(frames.pop().name)
+                    if frames:
+                        frames[-1].conflicts |= culprits - {frames[-1].name}
+                    continue
+                break
+
+            if not frames:
+                raise ResolutionError(*conflict)
+
+    def install_order(self, deps):
+        order = []
+        visited = set()
+        for dep in deps:
+            if dep.name in visited:
+                continue
+            visited.add(dep.name)
+            stack = [(dep.name, iter(self.requirements[dep.name]))]
+            while stack:
+                name, children = stack[-1]
+                for child in children:
+                    if child.name in self.pins and child.name not in visited:
+                        visited.add(child.name)
+                        stack.append((child.name, iter(self.requirements[child.name])))
+                        break
+                else:
+                    stack.pop()
+                    order.append(name)
+        return order
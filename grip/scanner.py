@@ -0,0 +1,51 @@
+import contextlib
+import os
+import sys
+
+import grip.ui as ui
+
+
+def scan_project(path):
+    '''
+    Loads the dependency graph of the project in `path` and reduces it to
+    plain data. Runs in a worker process
+    '''
+    from .app import App
+
+    result = {'path': path, 'virtualenv': None, 'requirements': None, 'error': None}
+    # anything the loaders print must not end up in the report
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            app = App()
+            virtualenv = app.locate_virtualenv(path)
+            if not virtualenv:
+                result['error'] = 'no virtualenv found'
+                return result
+            app.set_virtualenv(virtualenv)
+            app.set_requirements(app.locate_requirements(path))
+            graph = app.load_dependency_graph()
+        except (Exception, SystemExit) as e:
+            result['error'] = str(e) or type(e).__name__
+            return result
+
+    if app.requirements:
+        wanted = [str(x) for x in graph.requirements.deps if not x.url]
+    else:
+        wanted = [x.name for x in graph]
+
+    result.update({
+        'virtualenv': virtualenv,
+        'requirements': str(app.requirements) if app.requirements else None,
+        'packages': {x.name: str(x.version) for x in graph},
+        'problems': list(ui.problem_records(graph)),
+        'wanted': wanted,
+    })
+    return result
+
+
+def scan(paths, jobs=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    paths = [os.path.abspath(x) for x in paths]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(scan_project, paths))
@@ -0,0 +1,50 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from grip.downloads import ArtifactCache, HashMismatch
+
+
+DATA = b'0123456789' * 1000
+DIGEST = hashlib.sha256(DATA).hexdigest()
+URL = 'https://example.com/six-1.11.0.tar.gz'
+
+
+def response(status_code, data):
+    return Mock(status_code=status_code, iter_content=lambda size: [data[i:i + size] for i in range(0, len(data), size)])
+
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ArtifactCache(self.tmp.name, session=Mock())
+        self.cache.session.get.return_value = response(200, DATA)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fetch(self):
+        path = self.cache.fetch(URL + '#sha256=' + DIGEST)
+        self.assertEqual(path, os.path.join(self.tmp.name, 'sha256', DIGEST[:2], DIGEST, 'six-1.11.0.tar.gz'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertEqual(self.cache.fetch(URL), path)
+        self.assertEqual(self.cache.fetch_many([URL, URL + '#sha256=' + DIGEST]), [path, path])
+        self.assertEqual(self.cache.session.get.call_count, 1)
+
+    def test_resume(self):
+        os.makedirs(os.path.join(self.tmp.name, 'partial'))
+        with open(os.path.join(self.tmp.name, 'partial', self.cache.key_of(URL)), 'wb') as f:
+            f.write(DATA[:1234])
+        self.cache.session.get.return_value = response(206, DATA[1234:])
+        path = self.cache.fetch(URL + '#sha256=' + DIGEST)
+        self.assertEqual(self.cache.session.get.call_args[1]['headers'], {'Range': 'bytes=1234-'})
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_mismatch(self):
+        with self.assertRaises(HashMismatch):
+            self.cache.fetch(URL + '#md5=' + hashlib.md5(b'other').hexdigest())
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'partial')), [])
+        self.assertIsNone(self.cache.get(URL))
@@ -1,18 +1,193 @@
+import http.server
+import io
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import Mock, patch
 from grip.model import Package, Dependency
+from grip.downloads import WheelCache
 from grip.index import Index
+from grip.test.util import candidate
 
 
 class TestIndex(unittest.TestCase):
     def test_best_candidate_of(self):
         i = Index('')
-        pkgs = [Package('django', '1.0'), Package('django', '2.0'), Package('django', '3.0-beta')]
-        for pkg in pkgs:
-            pkg.location = MagicMock()
-            pkg.location.is_wheel = False
+        pkgs = [candidate('django', '1.0'), candidate('django', '2.0'), candidate('django', '3.0-beta')]
         self.assertEquals(i.best_candidate_of(Dependency('django>=1.0'), pkgs), pkgs[1])
         self.assertEquals(i.best_candidate_of(Dependency('django>=2.0'), pkgs), pkgs[1])
         self.assertEquals(i.best_candidate_of(Dependency('django>2.0'), pkgs), pkgs[2])
         self.assertEquals(i.best_candidate_of(Dependency('django>2.0'), []), None)
         self.assertEquals(i.best_candidate_of(None, pkgs), pkgs[2])
+
+    def test_best_candidates_of(self):
+        i = Index('')
+        pkgs = [candidate('django', '1.0'), candidate('django', '2.0'), candidate('django', '3.0-beta')]
+        deps = [Dependency('django>=1.0'), Dependency('django<2'), Dependency('django>2.0'), Dependency('django>4'), None]
+        self.assertEqual(i.best_candidates_of(deps, pkgs), [pkgs[1], pkgs[0], pkgs[2], None, pkgs[2]])
+        self.assertEqual(i.best_candidates_of(deps, []), [None] * 5)
+
+    def test_sorted_candidates_of(self):
+        i = Index('')
+        pkgs = [candidate('django', '1.0'), candidate('django', '2.0'), candidate('django', '2.0', wheel=True), candidate('django', '3.0-beta')]
+        self.assertEqual(i.sorted_candidates_of([Dependency('django>=1.0')], pkgs), [pkgs[2], pkgs[0]])
+        self.assertEqual(i.sorted_candidates_of([Dependency('django>=1.0'), Dependency('django<2')], pkgs), [pkgs[0]])
+        self.assertEqual(i.sorted_candidates_of([Dependency('django>2.0')], pkgs), [pkgs[3]])
+
+    def test_candidates_for_many(self):
+        i = Index('', concurrency=4)
+        active = []
+        peak = []
+
+        def candidates_for(dep, source=False):
+            active.append(dep)
+            peak.append(len(active))
+            time.sleep(0.01)
+            active.remove(dep)
+            return [Package(dep.name, '1.0')]
+
+        i.candidates_for = candidates_for
+        progress = []
+        deps = [Dependency(f'pkg{x}') for x in range(20)]
+        result = i.candidates_for_many(deps, progress=lambda dep, candidates: progress.append(dep))
+        self.assertEqual([x[0].name for x in result], [x.name for x in deps])
+        self.assertEqual(len(progress), 20)
+        self.assertLessEqual(max(peak), 4)
+
+
+class TestCandidateCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    PAGE = b'''<html><body>
+        <a href="../../packages/six-1.10.0.tar.gz">six-1.10.0.tar.gz</a>
+        <a href="../../packages/six-1.11.0-py2.py3-none-any.whl">six-1.11.0-py2.py3-none-any.whl</a>
+        <a href="../../packages/six-1.12.0-cp27-cp27mu-manylinux1_x86_64.whl">six-1.12.0-cp27-cp27mu-manylinux1_x86_64.whl</a>
+    </body></html>'''
+
+    def mkresponse(self, status_code=200, etag='"a"', content=PAGE):
+        headers = {'Content-Type': 'text/html'}
+        if etag:
+            headers['ETag'] = etag
+        return Mock(status_code=status_code, headers=headers, content=content, url='https://example.com/simple/six/')
+
+    def mkindex(self, ttl=600):
+        i = Index('https://example.com/simple/', cache_ttl=ttl, cache_dir=self.tmp.name)
+        i.session = Mock()
+        i.session.get.return_value = self.mkresponse()
+        return i
+
+    def test_memory(self):
+        i = self.mkindex()
+        candidates = i.candidates_for(Dependency('six'))
+        self.assertEqual([str(x.version) for x in candidates], ['1.10.0', '1.11.0'])
+        self.assertEqual(candidates[1].location.url, 'https://example.com/packages/six-1.11.0-py2.py3-none-any.whl')
+        i.candidates_for(Dependency('six'), source=True)
+        self.assertEqual(i.session.get.call_count, 1)
+        self.assertEqual(i.session.get.call_args[0][0], 'https://example.com/simple/six/')
+
+    def test_disk(self):
+        self.mkindex().candidates_for(Dependency('six'))
+        i = self.mkindex()
+        candidates = i.candidates_for(Dependency('six'))
+        self.assertEqual([str(x.version) for x in candidates], ['1.10.0', '1.11.0'])
+        self.assertEqual(candidates[1].location.url, 'https://example.com/packages/six-1.11.0-py2.py3-none-any.whl')
+        self.assertEqual([str(x.version) for x in i.candidates_for(Dependency('six'), source=True)], ['1.10.0'])
+        i.session.get.assert_not_called()
+
+    def test_unfiltered(self):
+        # links this interpreter can't use are kept on disk for others sharing the cache
+        self.mkindex().candidates_for(Dependency('six'))
+        with open(self.mkindex().cache.file_for('six')) as f:
+            links = [url for url, requires_python in json.load(f)['links']]
+        self.assertEqual(len(links), 3)
+        self.assertIn('https://example.com/packages/six-1.12.0-cp27-cp27mu-manylinux1_x86_64.whl', links)
+
+    def test_revalidation(self):
+        self.mkindex(ttl=0).candidates_for(Dependency('six'))
+
+        i = self.mkindex(ttl=0)
+        i.session.get.return_value = self.mkresponse(status_code=304, etag=None, content=b'')
+        self.assertEqual(len(i.candidates_for(Dependency('six'))), 2)
+        self.assertEqual(i.session.get.call_args[1]['headers'], {'Accept': 'text/html', 'If-None-Match': '"a"'})
+
+        i.session.get.return_value = self.mkresponse(etag='"b"', content=b'<html></html>')
+        self.assertEqual(i.candidates_for(Dependency('six')), [])
+
+    def test_offline(self):
+        os.makedirs(os.path.join(self.tmp.name, 'wheels', 'six'))
+        for name in ['six-1.11.0-py2.py3-none-any.whl', 'six-1.10.0-cp27-cp27mu-manylinux1_x86_64.whl']:
+            open(os.path.join(self.tmp.name, 'wheels', 'six', name), 'w').close()
+        i = self.mkindex()
+        i.wheels = WheelCache(os.path.join(self.tmp.name, 'wheels'))
+        i.offline = True
+        candidates = i.candidates_for(Dependency('six'))
+        self.assertEqual([str(x.version) for x in candidates], ['1.11.0'])
+        self.assertTrue(candidates[0].location.url.startswith('file://'))
+        self.assertEqual(i.candidates_for(Dependency('six'), source=True), [])
+        i.session.get.assert_not_called()
+
+
+class SimpleIndexHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    root = None
+
+    def translate_path(self, path):
+        return os.path.join(self.root, *path.split('?')[0].strip('/').split('/'))
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class TestIndexServer(unittest.TestCase):
+    PACKAGES = {
+        'django': ['Django-1.11.tar.gz', 'Django-2.0-py3-none-any.whl'],
+        'six': ['six-1.10.0.tar.gz', 'six-1.11.0.tar.gz'],
+    }
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name, files in self.PACKAGES.items():
+            os.makedirs(os.path.join(self.tmp.name, 'simple', name))
+            with open(os.path.join(self.tmp.name, 'simple', name, 'index.html'), 'w') as f:
+                f.write('<html><body>')
+                for file in files:
+                    f.write(f'<a href="/files/{file}">{file}</a>')
+                f.write('</body></html>')
+
+        handler = type('Handler', (SimpleIndexHandler,), {'root': self.tmp.name})
+        self.server = ThreadingServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_candidates_for_many(self):
+        i = Index('http://127.0.0.1:%i/simple/' % self.server.server_address[1], concurrency=2, cache_dir=self.tmp.name)
+        django, six = i.candidates_for_many([Dependency('django'), Dependency('six')])
+        self.assertEqual(sorted(str(x.version) for x in django), ['1.11', '2.0'])
+        self.assertEqual(sorted(str(x.version) for x in six), ['1.10.0', '1.11.0'])
+
+    def test_unreachable(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        i = Index('http://127.0.0.1:%i/simple/' % port, concurrency=2, cache_dir=self.tmp.name)
+        with patch('sys.stdout', io.StringIO()) as stdout:
+            self.assertEqual(i.candidates_for_many([Dependency('django'), Dependency('six')]), [[], []])
+        self.assertIn('Could not fetch', stdout.getvalue())
+        self.assertIsNone(i.cache.get('six'))
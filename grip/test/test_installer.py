@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import Mock, patch
+from pip.index import Link
+from grip.model import Dependency, Version
+from grip.downloads import WheelCache
+from grip.installer import Installer, wheel_requirements
+from grip.planner import InstallAction
+
+
+def mkwheel(dir, name, version, requires=[]):
+    path = os.path.join(dir, f'{name}-{version}-py3-none-any.whl')
+    with zipfile.ZipFile(path, 'w') as wheel:
+        metadata = f'Metadata-Version: 2.0\nName: {name}\nVersion: {version}\n'
+        for req in requires:
+            metadata += f'Requires-Dist: {req}\n'
+        wheel.writestr(f'{name}-{version}.dist-info/METADATA', metadata)
+    return path
+
+
+class TestInstaller(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.wheels = {
+            'celery': mkwheel(self.tmp.name, 'celery', '4.0', ['kombu (>=4)', 'pytz']),
+            'kombu': mkwheel(self.tmp.name, 'kombu', '4.1', ['amqp; extra == "amqp"', 'vine']),
+            'vine': mkwheel(self.tmp.name, 'vine', '1.1'),
+            'pytz': mkwheel(self.tmp.name, 'pytz', '2018'),
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def mkinstaller(self):
+        installer = Installer('/nonexistent', jobs=2, wheels=WheelCache(os.path.join(self.tmp.name, 'wheels')))
+        installer.download = lambda action: self.wheels[action.dependency.name]
+        return installer
+
+    def mkdep(self, name):
+        dep = Dependency(name)
+        dep.potential_candidate = Mock(location=Link(f'https://x/{dep.name}.tar.gz'))
+        return dep
+
+    def test_wheel_requirements(self):
+        self.assertEqual(wheel_requirements(self.wheels['celery']), ['kombu>=4', 'pytz'])
+        self.assertEqual(wheel_requirements(self.wheels['kombu']), ['vine'])
+        self.assertEqual(wheel_requirements(self.wheels['kombu'], extras=['amqp']), ['amqp', 'vine'])
+
+    def test_requirements_for(self):
+        installer = self.mkinstaller()
+        dep = self.mkdep('kombu[amqp]')
+        self.assertEqual(installer.requirements_for(dep), ['amqp', 'vine'])
+        self.assertEqual(installer.artifacts, {
+            'kombu[amqp]': os.path.join(self.tmp.name, 'wheels', 'kombu', 'kombu-4.1-py3-none-any.whl'),
+        })
+
+    def test_wheel_cache(self):
+        self.mkinstaller().prefetch([self.mkdep('kombu')])
+        installer = self.mkinstaller()
+        installer.download = Mock(side_effect=AssertionError)
+        dep = self.mkdep('kombu')
+        dep.potential_candidate.version = Version('4.1')
+        self.assertEqual(installer.requirements_for(dep), ['vine'])
+        self.assertEqual(
+            [str(x.version) for x in installer.wheels.candidates_for('kombu')],
+            ['4.1'],
+        )
+
+    def test_wheel_cache_pinned(self):
+        self.mkinstaller().prefetch([self.mkdep('kombu')])
+        installer = self.mkinstaller()
+        installer.download = Mock(return_value=self.wheels['kombu'])
+        dep = self.mkdep('kombu')
+        dep.potential_candidate.version = Version('4.1')
+        dep.potential_candidate.location = Link('https://x/kombu-4.1-py3-none-any.whl#sha256=' + '0' * 64)
+        self.assertEqual(installer.requirements_for(dep), ['vine'])
+        installer.download.assert_called_once()
+
+    def test_build_fail(self):
+        installer = self.mkinstaller()
+        installer.download = lambda action: os.path.join(self.tmp.name, action.dependency.name + '.tar.gz')
+        installer.pip = Mock(return_value=(1, 'error: no compiler\n'))
+        with installer, patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit):
+                installer.prefetch([self.mkdep('a'), self.mkdep('b')])
+        self.assertIn('no compiler', stderr.getvalue())
+        self.assertEqual(installer.pip.call_count, 2)
+
+    def test_levels(self):
+        installer = self.mkinstaller()
+        actions = [InstallAction(self.mkdep(x)) for x in ['celery', 'kombu', 'pytz', 'vine']]
+        levels = installer.levels(actions)
+        self.assertEqual(
+            [sorted(x.dependency.name for x in level) for level in levels],
+            [['pytz', 'vine'], ['kombu'], ['celery']],
+        )
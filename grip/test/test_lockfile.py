@@ -0,0 +1,22 @@
+import os
+import tempfile
+import unittest
+from grip.lockfile import Lockfile
+from grip.model import Package
+
+
+class TestLockfile(unittest.TestCase):
+    def test_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            lockfile = Lockfile(os.path.join(tmp, Lockfile.FILENAME))
+            lockfile.write([
+                (Package('six', '1.11.0'), 'https://example.com/six-1.11.0.tar.gz#md5=abc', 'f' * 64),
+                (Package('Django', '2.0'), None, None),
+            ])
+            deps = lockfile.read()
+            self.assertEqual([str(x) for x in deps], ['django==2.0', 'six==1.11.0'])
+            self.assertIsNone(deps[0].potential_candidate)
+            self.assertEqual(
+                deps[1].potential_candidate.location.url,
+                'https://example.com/six-1.11.0.tar.gz#sha256=' + 'f' * 64,
+            )
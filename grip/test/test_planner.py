@@ -3,6 +3,7 @@ from unittest.mock import Mock
 from grip.model import PackageGraph, Package, Dependency
 from grip.index import Index
 from grip.planner import Planner, InstallAction, RemoveAction, SaveAction, FailAction
+from grip.test.util import candidate
 
 
 class TestPackageGraph(unittest.TestCase):
@@ -32,54 +33,142 @@ class TestPackageGraph(unittest.TestCase):
         p = self.mkplanner()
         self.assertPlanEquals(p.prune(), [RemoveAction(p.graph.find('celery'))])
 
-    def test_install_url(self):
+    def test_prune_chains(self):
+        pkgs = [Package(f'p{x}', '1') for x in range(6)]
+        for a, b in [(0, 1), (1, 2), (2, 3), (4, 5), (5, 4), (5, 2)]:
+            pkgs[a].deps.append(Dependency(f'p{b}', parent=pkgs[a]))
+        graph = PackageGraph(items=pkgs + [Package('pip', '9')], requirements=[Dependency('p3')])
+        graph.resolve_dependencies()
+        plan = [x.package.name for x in Planner(graph, quiet=True).prune()]
+        self.assertEqual(sorted(plan), ['p0', 'p1', 'p2', 'p4', 'p5'])
+        self.assertLess(plan.index('p0'), plan.index('p1'))
+        self.assertLess(plan.index('p1'), plan.index('p2'))
+        self.assertLess(plan.index('p5'), plan.index('p2'))
+
+    def mkindex(self, p, pkgs):
+        p.index = Index('')
+        p.index.candidates_for = Mock(return_value=pkgs)
+        p.metadata = Mock()
+        p.metadata.requirements_for.return_value = []
+
+    def test_resolve_url(self):
         p = self.mkplanner()
+        self.mkindex(p, [])
         d = Dependency('new==2.0')
         d.url = 'git@server:acme/new.git'
-        self.assertPlanEquals(p.install(d), [InstallAction(d)])
-        self.assertEquals(next(p.install(d)).dependency.url, d.url)
+        self.assertPlanEquals(p.resolve([d]), [InstallAction(d)])
+        self.assertEquals(next(p.resolve([d])).dependency.url, d.url)
 
-    def test_install_index(self):
+    def test_resolve_index(self):
         p = self.mkplanner()
-        p.index = Index('')
-        pkgs = [Package('new', '1.0'), Package('new', '2.0'), Package('new', '3.0-beta')]
-        for pkg in pkgs:
-            pkg.location = Mock()
-            pkg.location.is_wheel = False
-        p.index.candidates_for = Mock(return_value=pkgs)
-        plan = list(p.install(Dependency('New>=2')))
+        self.mkindex(p, [candidate('new', '1.0'), candidate('new', '2.0'), candidate('new', '3.0-beta')])
+        plan = list(p.resolve([Dependency('New>=2')]))
         self.assertTrue(isinstance(plan[0], InstallAction))
         self.assertEquals(str(plan[0].dependency), 'new==2.0')
 
-    def test_install_upgrade(self):
+    def test_resolve_upgrade(self):
         p = self.mkplanner()
-        p.index = Index('')
-        pkgs = [Package('django', '3.0')]
-        for pkg in pkgs:
-            pkg.location = Mock()
-            pkg.location.is_wheel = False
-        p.index.candidates_for = Mock(return_value=pkgs)
-        plan = list(p.install(Dependency('django>=3.0')))
+        self.mkindex(p, [candidate('django', '3.0')])
+        plan = list(p.resolve([Dependency('django>=3.0')]))
         self.assertTrue(isinstance(plan[0], RemoveAction))
         self.assertTrue(isinstance(plan[1], InstallAction))
         self.assertEquals(plan[0].package.name, 'django')
         self.assertEquals(str(plan[1].dependency), 'django==3.0')
 
-    def test_install_downgrade(self):
+    def test_resolve_downgrade(self):
         p = self.mkplanner()
-        p.index = Index('')
-        pkgs = [Package('django', '2.0')]
-        for pkg in pkgs:
-            pkg.location = Mock()
-            pkg.location.is_wheel = False
-        p.index.candidates_for = Mock(return_value=pkgs)
-
-        plan = list(p.install(Dependency('django==2.0')))
-        self.assertEquals(len(plan), 0)
-
-        plan = list(p.install(Dependency('django==2.0'), downgrade=True))
+        self.mkindex(p, [candidate('django', '2.0')])
+        plan = list(p.resolve([Dependency('django==2.0')]))
         self.assertEquals(len(plan), 2)
         self.assertTrue(isinstance(plan[0], RemoveAction))
         self.assertTrue(isinstance(plan[1], InstallAction))
         self.assertEquals(plan[0].package.name, 'django')
         self.assertEquals(str(plan[1].dependency), 'django==2.0')
+
+    def test_sync(self):
+        p = self.mkplanner()
+        locked = [Dependency('django==2.5'), Dependency('pytz==2018'), Dependency('six==1.11')]
+        for dep in locked:
+            dep.potential_candidate = candidate(dep.name, '1.0')
+        plan = list(p.sync(locked))
+        self.assertEqual(
+            [(type(x).__name__, str(x[0])) for x in plan],
+            [
+                ('RemoveAction', 'celery@1'),
+                ('RemoveAction', 'pytz@2016'),
+                ('InstallAction', 'pytz==2018'),
+                ('InstallAction', 'six==1.11'),
+            ],
+        )
+
+        locked[2].potential_candidate = None
+        self.assertIsInstance(list(p.sync(locked))[-1], FailAction)
+
+
+class TestResolver(unittest.TestCase):
+    INDEX = {
+        'celery': {
+            '4.1': ['kombu>=4.1', 'pytz'],
+            '4.0': ['kombu>=4,<4.1', 'pytz'],
+        },
+        'kombu': {
+            '4.1': ['vine>=1.2'],
+            '4.0': ['vine'],
+        },
+        'vine': {
+            '1.2': [],
+            '1.1': [],
+        },
+        'pytz': {
+            '2018': [],
+        },
+        'flower': {
+            '1.0': ['vine<1.2'],
+        },
+    }
+
+    def mkplanner(self, items=[]):
+        graph = PackageGraph(items=items)
+        graph.resolve_dependencies()
+        p = Planner(graph=graph, index=Index(''), quiet=True, metadata=Mock())
+
+        def candidates_for(dep, source=False):
+            pkgs = [candidate(dep.name, x, wheel=True) for x in self.INDEX.get(dep.name, {})]
+            return pkgs
+
+        p.index.candidates_for = Mock(side_effect=candidates_for)
+        p.metadata.requirements_for = lambda dep: self.INDEX[dep.name][str(dep.potential_candidate.version)]
+        return p
+
+    def installs(self, plan):
+        return [str(x.dependency) for x in plan if isinstance(x, InstallAction)]
+
+    def test_resolve(self):
+        p = self.mkplanner()
+        plan = list(p.resolve([Dependency('celery')]))
+        self.assertEqual(self.installs(plan), ['vine==1.2', 'kombu==4.1', 'pytz==2018', 'celery==4.1'])
+
+    def test_resolve_backtrack(self):
+        p = self.mkplanner()
+        plan = list(p.resolve([Dependency('flower'), Dependency('celery')]))
+        self.assertEqual(self.installs(plan), ['vine==1.1', 'flower==1.0', 'kombu==4.0', 'pytz==2018', 'celery==4.0'])
+        self.assertEqual(p.index.candidates_for.call_count, 5)
+
+    def test_resolve_installed(self):
+        p = self.mkplanner(items=[Package('vine', '1.1'), Package('kombu', '4.0', deps=[Dependency('vine')])])
+        plan = list(p.resolve([Dependency('celery')], save=True))
+        self.assertEqual(
+            [x.package.name for x in plan if isinstance(x, RemoveAction)],
+            ['vine', 'kombu'],
+        )
+        self.assertEqual(self.installs(plan), ['vine==1.2', 'kombu==4.1', 'pytz==2018', 'celery==4.1'])
+        self.assertTrue(isinstance(plan[-1], SaveAction))
+        self.assertEqual(str(plan[-1].spec), 'celery==4.1')
+
+        plan = list(p.resolve([Dependency('kombu<4.1')]))
+        self.assertEqual(plan, [])
+
+    def test_resolve_fail(self):
+        p = self.mkplanner()
+        plan = list(p.resolve([Dependency('flower'), Dependency('kombu>=4.1')]))
+        self.assertEqual(plan, [FailAction()])
@@ -0,0 +1,99 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import grip.ui as ui
+from grip.app import App
+from grip.index import Index
+from grip.model import PackageGraph, Package, Dependency
+from grip.ui import RecordWriter
+from grip.test.util import candidate
+
+
+class TestRecordWriter(unittest.TestCase):
+    def test_formats(self):
+        records = [{'name': 'six', 'version': '1.11.0'}, {'name': 'pytz', 'version': '2018.3'}]
+        for format, parse in [
+            ('json', json.loads),
+            ('ndjson', lambda x: [json.loads(y) for y in x.splitlines()]),
+        ]:
+            stream = io.StringIO()
+            with patch.object(RecordWriter, 'CHUNK_SIZE', 1):
+                with RecordWriter(format, stream=stream) as writer:
+                    for record in records:
+                        writer.write(record)
+            self.assertEqual(parse(stream.getvalue()), records)
+
+        stream = io.StringIO()
+        RecordWriter('json', stream=stream).close()
+        self.assertEqual(json.loads(stream.getvalue()), [])
+
+
+class TestCheck(unittest.TestCase):
+    def test_records(self):
+        celery = Package('celery', '1')
+        django = Package('django', '2.5')
+        celery.deps = [Dependency('django>=2', parent=celery)]
+        django.deps = [Dependency('pytz>2017', parent=django)]
+        graph = PackageGraph(items=[celery, django, Package('pytz', '2016')], requirements=[Dependency('django>1')])
+        graph.resolve_dependencies()
+
+        stream = io.StringIO()
+        with patch.object(App, 'load_dependency_graph', return_value=graph), patch('sys.stdout', stream):
+            App().perform_check(format='ndjson')
+        self.assertEqual([json.loads(x) for x in stream.getvalue().splitlines()], [
+            {'name': 'celery', 'version': '1', 'status': 'extraneous', 'required_by': []},
+            {'name': 'pytz', 'version': '2016', 'status': 'mismatch', 'required_by': [
+                {'name': 'django', 'specifier': '>2017', 'ok': False},
+            ]},
+        ])
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        self.env = patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.tmp.name, 'cache')})
+        self.env.start()
+        site_packages = os.path.join(self.tmp.name, 'env', 'lib', f'python{sys.version[:3]}', 'site-packages')
+        os.makedirs(os.path.join(self.tmp.name, 'env', 'bin'))
+        open(os.path.join(self.tmp.name, 'env', 'bin', 'activate'), 'w').close()
+        os.makedirs(os.path.join(site_packages, 'six-1.11.0.dist-info'))
+        with open(os.path.join(site_packages, 'six-1.11.0.dist-info', 'METADATA'), 'w') as f:
+            f.write('Metadata-Version: 2.0\nName: six\nVersion: 1.11.0\n')
+        with open(os.path.join(self.tmp.name, 'requirements.txt'), 'w') as f:
+            f.write('six\n')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        ui.set_log_file(None)
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def invoke(self, *args):
+        from grip.main import cli
+
+        with patch('sys.stdout', io.StringIO()) as stdout, patch('sys.stderr', io.StringIO()) as stderr:
+            cli.main(['-d', self.tmp.name, '-n', '--timings'] + list(args), standalone_mode=False)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_freeze(self):
+        stdout, stderr = self.invoke('freeze', '--format', 'ndjson')
+        self.assertEqual([json.loads(x) for x in stdout.splitlines()], [{'name': 'six', 'version': '1.11.0'}])
+        self.assertIn('Requirements file', stderr)
+        self.assertIn('Phase', stderr)
+
+        stdout, stderr = self.invoke('freeze', '--format', 'json')
+        self.assertEqual(json.loads(stdout), [{'name': 'six', 'version': '1.11.0'}])
+
+    def test_outdated(self):
+        with patch.object(Index, 'candidates_for_many', autospec=True, side_effect=lambda index, deps: [
+            [candidate('six', '1.11.0'), candidate('six', '1.12.0')] for dep in deps
+        ]):
+            stdout, stderr = self.invoke('outdated', '--format', 'ndjson')
+        records = [json.loads(x) for x in stdout.splitlines()]
+        self.assertEqual(records, [{'name': 'six', 'version': '1.11.0', 'available': '1.12.0', 'latest': '1.12.0'}])
+        self.assertIn('Phase', stderr)
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from grip.model import Package
+from grip.remover import Remover
+
+
+class TestRemover(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.files = ['a/__init__.py', 'a/sub/x.py', 'a/sub/y.py', 'a-1.dist-info/RECORD', 'shared/a.py']
+        os.makedirs(os.path.join(self.tmp.name, 'shared'))
+        with open(os.path.join(self.tmp.name, 'shared', 'b.py'), 'w'):
+            pass
+        for path in self.files:
+            os.makedirs(os.path.dirname(os.path.join(self.tmp.name, path)), exist_ok=True)
+            with open(os.path.join(self.tmp.name, path), 'w') as f:
+                f.write(path)
+        self.pkg = Package('a', '1', metadata=Mock())
+        self.pkg.metadata.get_metadata.return_value = '\n'.join(x + ',,' for x in self.files + ['a/missing.py'])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_remove(self):
+        with Remover(self.tmp.name) as remover:
+            remover.remove(self.pkg)
+            remover.prune()
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['shared'])
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'shared')), ['b.py'])
+
+    def test_rollback(self):
+        with self.assertRaises(SystemExit):
+            with Remover(self.tmp.name) as remover:
+                remover.remove(self.pkg)
+                remover.prune()
+                raise SystemExit(1)
+        for path in self.files:
+            with open(os.path.join(self.tmp.name, path)) as f:
+                self.assertEqual(f.read(), path)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['a', 'a-1.dist-info', 'shared'])
+
+    def test_rollback_installs(self):
+        with self.assertRaises(SystemExit):
+            with Remover(self.tmp.name) as remover:
+                remover.remove(self.pkg)
+                remover.prune()
+                remover.track_installs(['b-1.dist-info'])
+                # the first level of the install went through, with a new version of a
+                new_files = ['a/__init__.py', 'a/new/z.py', 'a-2.dist-info/RECORD', 'c.py']
+                for path in new_files:
+                    os.makedirs(os.path.dirname(os.path.join(self.tmp.name, path)), exist_ok=True)
+                    with open(os.path.join(self.tmp.name, path), 'w') as f:
+                        f.write('new')
+                with open(os.path.join(self.tmp.name, 'a-2.dist-info', 'RECORD'), 'w') as f:
+                    f.write('\n'.join(x + ',,' for x in new_files))
+                raise SystemExit(1)
+        for path in self.files:
+            with open(os.path.join(self.tmp.name, path)) as f:
+                self.assertEqual(f.read(), path)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['a', 'a-1.dist-info', 'shared'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.tmp.name, 'a'))), ['__init__.py', 'sub'])
+
+    def test_stale_trash(self):
+        stale = os.path.join(self.tmp.name, '.grip-trash-999999999-abc')
+        live = os.path.join(self.tmp.name, '.grip-trash-%i-abc' % os.getpid())
+        for path in (stale, live):
+            os.makedirs(os.path.join(path, 'x'))
+        with Remover(self.tmp.name):
+            pass
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(live))
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from grip.model import Dependency
+from grip.requirements import TxtRequirements, SetupPyRequirements
+from grip.requirements.setup import SetupCache
+
+
+class TestTxtRequirements(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'requirements.txt')
+        self.write('requirements.txt', (
+            '# pinned\n'
+            '--index-url https://example.com/simple\n'
+            'django>=2  # web\n'
+            'celery \\\n'
+            '    >=4.0\n'
+            '-r base.txt\n'
+            '-e git+https://example.com/tool.git#egg=tool\n'
+        ))
+        self.write('base.txt', 'six==1.11.0 --hash=sha256:abc\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        with open(os.path.join(self.tmp.name, name), 'w') as f:
+            f.write(content)
+
+    def content(self, name):
+        with open(os.path.join(self.tmp.name, name)) as f:
+            return f.read()
+
+    def test_read(self):
+        deps = list(TxtRequirements(self.path).read())
+        self.assertEqual([str(x) for x in deps], [
+            'django>=2', 'celery>=4.0', 'six==1.11.0', 'git+https://example.com/tool.git#egg=tool',
+        ])
+
+    def test_batch(self):
+        original = self.content('requirements.txt')
+        requirements = TxtRequirements(self.path)
+        with patch.object(TxtRequirements, 'write', autospec=True, side_effect=TxtRequirements.write) as write:
+            with requirements.batch():
+                requirements.add(Dependency('django>=2.1'))
+                requirements.add(Dependency('six==1.12.0'))
+                requirements.add(Dependency('pytz'))
+                requirements.remove('celery')
+                self.assertEqual(self.content('requirements.txt'), original)
+            self.assertEqual(write.call_count, 2)
+
+        self.assertEqual(self.content('requirements.txt'), (
+            '# pinned\n'
+            '--index-url https://example.com/simple\n'
+            'django>=2.1\n'
+            '-r base.txt\n'
+            '-e git+https://example.com/tool.git#egg=tool\n'
+            'pytz\n'
+        ))
+        self.assertEqual(self.content('base.txt'), 'six==1.12.0\n')
+
+
+class TestSetupPyRequirements(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SetupCache(os.path.join(self.tmp.name, 'cache.json'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        with open(os.path.join(self.tmp.name, name), 'w') as f:
+            f.write(content)
+
+    def read(self, name='setup.py'):
+        return [str(x) for x in SetupPyRequirements(os.path.join(self.tmp.name, name), cache=self.cache).read()]
+
+    def test_static(self):
+        self.write('setup.py', (
+            'from setuptools import setup\n'
+            'base = ["six>=1.10", "pytz"]\n'
+            'setup(name="x", install_requires=base + ["django>=2"], tests_require="nose\\nmock")\n'
+        ))
+        with patch.object(SetupPyRequirements, 'run_setup_py', side_effect=AssertionError):
+            self.assertEqual(self.read(), ['six>=1.10', 'pytz', 'django>=2', 'nose', 'mock'])
+
+        with patch.object(SetupPyRequirements, 'extract', side_effect=AssertionError):
+            self.assertEqual(self.read(), ['six>=1.10', 'pytz', 'django>=2', 'nose', 'mock'])
+
+    def test_dynamic(self):
+        self.write('setup.py', (
+            'from setuptools import setup\n'
+            'requires = ["six"]\n'
+            'requires.append("pytz")\n'
+            'setup(name="x", install_requires=[x + ">=1" for x in requires])\n'
+        ))
+        self.assertRaises(ValueError, SetupPyRequirements.parse_setup_py, os.path.join(self.tmp.name, 'setup.py'))
+        self.assertEqual(self.read(), ['six>=1', 'pytz>=1'])
+        # setup.py may read anything, so running it again is the only way to be sure
+        with patch.object(SetupPyRequirements, 'run_setup_py', return_value={'install_requires': ['six']}):
+            self.assertEqual(self.read(), ['six'])
+
+    def test_rebound(self):
+        self.write('setup.py', (
+            'import sys\n'
+            'from setuptools import setup\n'
+            'install_requires = ["requests"]\n'
+            'if sys.version_info < (4,):\n'
+            '    install_requires = install_requires + ["six"]\n'
+            'setup(name="x", install_requires=install_requires)\n'
+        ))
+        self.assertRaises(ValueError, SetupPyRequirements.parse_setup_py, os.path.join(self.tmp.name, 'setup.py'))
+        self.assertEqual(self.read(), ['requests', 'six'])
+
+        self.write('setup.py', (
+            'from setuptools import setup\n'
+            'requires = ["requests"]\n'
+            'def extend():\n'
+            '    global requires\n'
+            '    requires = requires + ["six"]\n'
+            'extend()\n'
+            'setup(name="x", install_requires=requires)\n'
+        ))
+        self.assertRaises(ValueError, SetupPyRequirements.parse_setup_py, os.path.join(self.tmp.name, 'setup.py'))
+        self.assertEqual(self.read(), ['requests', 'six'])
+
+    def test_declarative(self):
+        self.write('setup.py', 'from setuptools import setup\nsetup()\n')
+        self.write('setup.cfg', '[options]\ninstall_requires =\n    six>=1.10\n    pytz\n')
+        self.assertEqual(self.read(), ['six>=1.10', 'pytz'])
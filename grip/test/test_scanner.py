@@ -0,0 +1,66 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+from grip.app import App
+from grip.index import Index
+from grip.scanner import scan
+from grip.test.util import candidate
+
+
+class TestScan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.project('a', {'six': ('1.10.0', []), 'pytz': ('2016', [])})
+        self.project('b', {'six': ('1.11.0', []), 'celery': ('4.0', ['six>=2'])})
+        os.makedirs(os.path.join(self.tmp.name, 'c'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def project(self, name, packages):
+        site_packages = os.path.join(
+            self.tmp.name, name, 'env', 'lib', f'python{sys.version[:3]}', 'site-packages',
+        )
+        os.makedirs(os.path.join(self.tmp.name, name, 'env', 'bin'))
+        open(os.path.join(self.tmp.name, name, 'env', 'bin', 'activate'), 'w').close()
+        for pkg, (version, requires) in packages.items():
+            dist_info = os.path.join(site_packages, f'{pkg}-{version}.dist-info')
+            os.makedirs(dist_info)
+            with open(os.path.join(dist_info, 'METADATA'), 'w') as f:
+                f.write(f'Metadata-Version: 2.0\nName: {pkg}\nVersion: {version}\n')
+                for x in requires:
+                    f.write(f'Requires-Dist: {x}\n')
+
+    def test_scan(self):
+        projects = scan([os.path.join(self.tmp.name, x) for x in 'abc'], jobs=2)
+        self.assertEqual([x['packages'] for x in projects[:2]], [
+            {'six': '1.10.0', 'pytz': '2016'}, {'celery': '4.0', 'six': '1.11.0'},
+        ])
+        self.assertEqual([(x['name'], x['status']) for x in projects[1]['problems']], [
+            ('celery', 'extraneous'), ('six', 'mismatch'),
+        ])
+        self.assertEqual(projects[2]['error'], 'no virtualenv found')
+
+    def test_outdated(self):
+        app = App()
+        app._index = Index('')
+        releases = {'six': ['1.10.0', '1.11.0'], 'pytz': ['2016', '2018.3'], 'celery': ['4.0']}
+        with patch.object(Index, 'candidates_for_many', autospec=True, side_effect=lambda index, deps: [
+            [candidate(dep.name, x) for x in releases[dep.name]] for dep in deps
+        ]) as candidates_for_many:
+            stream = io.StringIO()
+            with patch('sys.stdout', stream):
+                app.perform_scan([os.path.join(self.tmp.name, x) for x in 'ab'], outdated=True, format='ndjson')
+        candidates_for_many.assert_called_once()
+        self.assertEqual(sorted(x.name for x in candidates_for_many.call_args[0][1]), ['celery', 'pytz', 'six'])
+        self.assertEqual([json.loads(x)['outdated'] for x in stream.getvalue().splitlines()], [
+            [
+                {'name': 'pytz', 'version': '2016', 'available': '2018.3', 'latest': '2018.3'},
+                {'name': 'six', 'version': '1.10.0', 'available': '1.11.0', 'latest': '1.11.0'},
+            ],
+            [],
+        ])
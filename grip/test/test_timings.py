@@ -0,0 +1,24 @@
+import json
+import os
+import tempfile
+import unittest
+from grip.timings import Timings
+
+
+class TestTimings(unittest.TestCase):
+    def test_spans(self):
+        timings = Timings()
+        for _ in range(2):
+            with timings.span('a'):
+                pass
+        with self.assertRaises(ValueError):
+            with timings.span('b'):
+                raise ValueError()
+        self.assertEqual([x[:2] for x in timings.rows()], [['a', '2'], ['b', '1']])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            timings.write_trace(os.path.join(tmp, 'trace.json'))
+            with open(os.path.join(tmp, 'trace.json')) as f:
+                events = json.load(f)['traceEvents']
+        self.assertEqual([x['name'] for x in events], ['a', 'a', 'b'])
+        self.assertTrue(all(x['ph'] == 'X' and x['dur'] >= 0 for x in events))
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from grip.app import App
+
+
+class TestFindVirtualenv(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+        os.makedirs(os.path.join(self.root, 'project', 'a', 'b'))
+        os.makedirs(os.path.join(self.root, 'project', '.venv', 'bin'))
+        open(os.path.join(self.root, 'project', '.venv', 'bin', 'activate'), 'w').close()
+        self.env = patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.root, 'cache')})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_find(self):
+        app = App()
+        path = os.path.join(self.root, 'project', 'a', 'b')
+        virtualenv = os.path.join(self.root, 'project', '.venv')
+        self.assertEqual(app.find_virtualenv(path), virtualenv)
+
+        with patch.object(App, 'locate_virtualenv', side_effect=AssertionError):
+            self.assertEqual(app.find_virtualenv(path), virtualenv)
+
+        os.makedirs(os.path.join(path, 'env', 'bin'))
+        open(os.path.join(path, 'env', 'bin', 'activate'), 'w').close()
+        self.assertEqual(app.find_virtualenv(path), os.path.join(path, 'env'))
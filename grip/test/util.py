@@ -0,0 +1,12 @@
+from pip.index import InstallationCandidate, Link
+
+
+def candidate(name, version, wheel=False):
+    '''
+    An index candidate with a real link, since pip sorts wheels by their tags
+    '''
+    if wheel:
+        link = Link(f'https://x/{name}-{version}-py3-none-any.whl')
+    else:
+        link = Link(f'https://x/{name}-{version}.tar.gz')
+    return InstallationCandidate(name, version, link)
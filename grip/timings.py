@@ -0,0 +1,48 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Timings:
+    def __init__(self):
+        self.spans = OrderedDict()
+        self.events = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                count, total = self.spans.get(name, (0, 0.0))
+                self.spans[name] = (count + 1, total + end - start)
+                self.events.append((name, start, end, threading.get_ident()))
+
+    def rows(self):
+        return [
+            [name, str(count), '%.2f s' % total]
+            for name, (count, total) in self.spans.items()
+        ]
+
+    def write_trace(self, path):
+        # Chrome trace event format, loads in chrome://tracing and Perfetto
+        events = [
+            {
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self.origin) * 1000000,
+                'dur': (end - start) * 1000000,
+                'pid': os.getpid(),
+                'tid': thread,
+            }
+            for name, start, end, thread in self.events
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -1,2 +1,3 @@
 from .echo import *
 from .pkg import *
+from .records import *
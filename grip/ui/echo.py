@@ -11,6 +11,9 @@ styles = {
     'error': ['error', 'red'],
 }
 
+# where log lines go, stdout unless it carries machine-readable output
+log_file = None
+
 colors = [
     'grey',
     'red',
@@ -23,10 +26,16 @@ colors = [
 ]
 
 
+def set_log_file(file):
+    global log_file
+    log_file = file
+
+
 def do_log(style, *parts, attrs=['bold']):
     print(
         colored(styles[style][0], styles[style][1], attrs=attrs),
         *parts,
+        file=log_file,
     )
 
 
@@ -92,19 +101,19 @@ def prompt(*parts, default=None, validate=lambda x: x):
     return result
 
 
-def table(header, rows, pad=2):
+def table(header, rows, pad=2, file=None):
     max_w = [0] * len(header)
     for row in [header] + rows:
         for index, item in enumerate(row):
             max_w[index] = max(max_w[index], len(strip_ansi(item)))
     width = pad * (len(header) - 1) + sum(max_w)
 
-    print()
+    print(file=file)
     for row in [header, [colored('-' * width, 'white', attrs=['dark'])]] + rows:
         for index, item in enumerate(row):
-            print(str(item) + ' ' * (max_w[index] + pad - len(strip_ansi(item))), end='')
-        print()
-    print()
+            print(str(item) + ' ' * (max_w[index] + pad - len(strip_ansi(item))), end='', file=file)
+        print(file=file)
+    print(file=file)
 
 
 @contextmanager
@@ -1,8 +1,9 @@
-from ..model import PackageGraph
 from .echo import red, cyan, bold, green
 
 
 def pkg(p, name=True, version=True):
+    from ..model import PackageGraph
+
     if not p:
         return red('none')
     if p.name == PackageGraph.PROJECT_PKG:
@@ -0,0 +1,88 @@
+import json
+import sys
+
+
+FORMATS = ('text', 'json', 'ndjson')
+
+
+class RecordWriter:
+    '''
+    Writes records either as a single JSON array or as newline-delimited
+    JSON. Output is collected and written in large chunks
+    '''
+    CHUNK_SIZE = 1000
+
+    def __init__(self, format, stream=None):
+        self.format = format
+        self.stream = stream or sys.stdout
+        self.encoder = json.JSONEncoder()
+        self.chunks = []
+        self.count = 0
+
+    def write(self, record):
+        text = self.encoder.encode(record)
+        if self.format == 'json':
+            text = ('[' if not self.count else ',\n') + text
+        else:
+            text += '\n'
+        self.chunks.append(text)
+        self.count += 1
+        if len(self.chunks) >= RecordWriter.CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.stream.write(''.join(self.chunks))
+        self.chunks = []
+
+    def close(self):
+        if self.format == 'json':
+            self.chunks.append(']\n' if self.count else '[]\n')
+        self.flush()
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+def package_record(pkg, deps=False):
+    record = {'name': pkg.name, 'version': str(pkg.version)}
+    if deps:
+        record['dependencies'] = [dependency_record(x) for x in pkg.deps]
+    return record
+
+
+def dependency_record(dep):
+    return {
+        'name': dep.name,
+        'specifier': str(dep.specifier),
+        'url': dep.url,
+        'resolved_to': str(dep.resolved_to.version) if dep.resolved_to else None,
+    }
+
+
+def problem_records(graph):
+    from ..model import PackageGraph
+
+    for pkg in graph:
+        if pkg.name in PackageGraph.SYSTEM_PKGS:
+            continue
+        if len(pkg.incoming_mismatched) > 0:
+            status = 'mismatch'
+        elif len(pkg.incoming) == 0:
+            status = 'extraneous'
+        else:
+            continue
+        record = package_record(pkg)
+        record['status'] = status
+        record['required_by'] = [
+            {
+                'name': dep.parent.name,
+                'specifier': str(dep.specifier),
+                'ok': dep in pkg.incoming,
+            }
+            for dep in pkg.incoming + pkg.incoming_mismatched
+        ]
+        yield record
@@ -0,0 +1,23 @@
+import os
+
+from .jsoncache import JsonCache, cache_path
+
+
+class VirtualenvCache(JsonCache):
+    '''
+    Remembers which virtualenv (if any) every directory contains. An entry is
+    valid for as long as the directory's mtime stays the same, since adding
+    or removing a virtualenv folder always changes it
+    '''
+
+    def __init__(self, path=None):
+        super().__init__(path or cache_path('virtualenvs.json'))
+
+    def get(self, dir, mtime):
+        entry = self.get_entry(dir)
+        if entry and entry['mtime'] == mtime:
+            if not entry['virtualenv'] or os.path.exists(os.path.join(entry['virtualenv'], 'bin', 'activate')):
+                return entry
+
+    def put(self, dir, mtime, virtualenv):
+        self.put_entry(dir, {'mtime': mtime, 'virtualenv': virtualenv})